@@ -3,7 +3,10 @@ import asyncio
 import os
 import argparse
 import logging
+import multiprocessing
 import sys
+from pathlib import Path
+import uvicorn
 from uvicorn import Config, Server
 from genie.log_setup import setup_logging
 from genie.config_loader import get_log_path, get_log_level, get_max_tokens_in_memory, load_config, get_log_retention_days, get_chat_history_path
@@ -22,6 +25,33 @@ async def run_server(app_to_run, host, port):
         )
     server = Server(config)
     await server.serve()
+
+# Import strings of the apps; uvicorn worker processes import the app themselves
+APP_IMPORTS = {"genie": "genie.agent.main:app", "qcli": "genie.amazonq.main:app"}
+
+def run_workers(app_import, host, port, workers):
+    """Run `workers` uvicorn processes sharing one socket (same server options as run_server).
+    Only conversations are shared (through the SQLite store). Everything else is per worker:
+    the active model (so /genie/model is rejected), the response and tool caches, execution
+    traces (/genie/trace answers only on the worker that ran the request) and admission
+    limits (the effective limit is `workers` times admission_max_concurrency).
+    """
+    # Sessions must outlive a single process: every worker reads and writes the SQLite conversation store
+    if not os.getenv("GENIE_CONVERSATION_STORE"):
+        os.environ["GENIE_CONVERSATION_STORE"] = "sqlite"
+    if not os.getenv("GENIE_CONVERSATION_DB"):
+        os.environ["GENIE_CONVERSATION_DB"] = str(Path.home() / ".genie" / "conversations.db")
+    logger.info(f"Conversation store: {os.environ['GENIE_CONVERSATION_STORE']} ({os.environ['GENIE_CONVERSATION_DB']})")
+    os.environ["GENIE_WORKERS"] = str(workers)
+    logger.warning(f"Model selection, caches, traces and admission limits are per worker ({workers} workers)")
+    uvicorn.run(app_import, host=host, port=port, workers=workers, log_config=None,
+        http="httptools",
+        ws="websockets",
+        lifespan="on",
+        access_log=False,
+        server_header=False,
+        date_header=False,
+        )
     
 def get_app(mode=None):
     normalized_mode = (mode or os.getenv("APP_MODE", "genie")).lower()
@@ -38,6 +68,8 @@ def get_app(mode=None):
     raise RuntimeError(f"Invalid APP_MODE={normalized_mode}; expected 'genie' or 'qcli'")
 
 if __name__ == "__main__":
+    # The PyInstaller build starts worker processes from this executable (--workers)
+    multiprocessing.freeze_support()
     parser = argparse.ArgumentParser(description="Genie Launcher")
     parser.add_argument("-m", "--app-mode", dest="app_mode", choices=["genie", "qcli"], help="Which app to run")
     parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"), help="Host to bind")
@@ -46,6 +78,7 @@ if __name__ == "__main__":
     parser.add_argument("--log-path", type=str, dest="log_path", help="Log file location")
     parser.add_argument("--chat-history-path", type=str, dest="chat_history_path", help="Chat history file location")
     parser.add_argument("--providers-file", type=str, dest="providers_file", help="get the providers info")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "1")), help="Number of worker processes (genie mode)")
     args = parser.parse_args()
     
     try:
@@ -73,9 +106,13 @@ if __name__ == "__main__":
             logger.info(f"Chat history path: {chat_history_path}")
 
         setup_logging(log_level=log_level, log_dir=log_path, log_retention_days=log_days)
+        # Worker processes set up their own logging from these
+        if log_path:
+            os.environ["GENIE_LOG_PATH"] = str(log_path)
+        os.environ["GENIE_LOG_LEVEL"] = log_level if isinstance(log_level, str) else logging.getLevelName(log_level)
 
         logger = logging.getLogger('GenieLauncher')
-        logger.info(f"Config: {os.environ["APP_CONFIG_FILE"]}")
+        logger.info(f"Config: {os.environ['APP_CONFIG_FILE']}")
         logger.info(f"Providers file: {os.environ['providers_file']}")
         logger.debug(f"Log level: {log_level}")
         logger.debug(f"Log path: {log_path}")
@@ -87,6 +124,17 @@ if __name__ == "__main__":
         if args.app_mode:
             logger.info(f"Overriding APP_MODE environment variable with: {args.app_mode}")
 
+        mode = (args.app_mode or os.getenv("APP_MODE", "genie")).lower()
+        if args.workers > 1 and mode == "qcli":
+            # Every worker would drive its own Kiro CLI session
+            logger.warning("qcli mode runs a single worker; ignoring --workers")
+            args.workers = 1
+        if args.workers > 1 and mode in APP_IMPORTS:
+            logger.info(f"Starting {args.workers} workers on {args.host}:{args.port}")
+            run_workers(APP_IMPORTS[mode], args.host, args.port, args.workers)
+            logger.info("Server shut down normally")
+            sys.exit(0)
+
         app_to_run = get_app(args.app_mode)
         logger.info(f"Starting server on {args.host}:{args.port}")
 
@@ -0,0 +1,33 @@
+"""
+Stand-in MCP server for the load test: one knowledge-base tool with a fixed latency,
+served over streamable HTTP on localhost.
+
+    python benchmarks/fake_mcp_server.py --port 8765 --latency 0.02
+"""
+import argparse
+import asyncio
+
+from mcp.server.fastmcp import FastMCP
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake MCP server for Genie benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per tool call")
+    parser.add_argument("--result-chars", type=int, default=2000, help="Size of every tool result")
+    args = parser.parse_args()
+
+    mcp = FastMCP("bench_kb", host="127.0.0.1", port=args.port, log_level="WARNING")
+
+    @mcp.tool()
+    async def search_knowledge_base(query: str) -> str:
+        """Search the knowledge base for passages relevant to the query"""
+        await asyncio.sleep(args.latency)
+        passage = f"Passage about {query}. "
+        return (passage * (args.result_chars // len(passage) + 1))[:args.result_chars]
+
+    mcp.run(transport="streamable-http")
+
+
+if __name__ == "__main__":
+    main()
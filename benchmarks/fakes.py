@@ -0,0 +1,77 @@
+"""Deterministic stand-ins for the LLM provider used by the benchmarks (no network, no keys)."""
+import asyncio
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+FAKE_PROVIDER_ID = "bench-fake"
+FAKE_PROFILE_NAME = "bench"
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model with a fixed latency profile: `delay` seconds before the first token, then
+    `answer_tokens` tokens at `tokens_per_second`. When `tool_name` is bound, the first model
+    step of every turn calls that tool with the question, the second one answers.
+    Answers are a pure function of the question, so runs are reproducible.
+    """
+
+    delay: float = 0.05
+    tokens_per_second: float = 200.0
+    answer_tokens: int = 40
+    tool_name: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return FAKE_PROVIDER_ID
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tool_names=[getattr(t, "name", None) or t.get("name") for t in tools], **kwargs)
+
+    def _plan(self, messages: List[BaseMessage], tool_names: Optional[List[str]]) -> AIMessage:
+        question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        usage = {"input_tokens": input_tokens, "output_tokens": 0, "total_tokens": input_tokens}
+        if self.tool_name and self.tool_name in (tool_names or []) and not isinstance(messages[-1], ToolMessage):
+            call_id = f"call_{zlib.crc32(question.encode()):08x}"
+            usage.update(output_tokens=8, total_tokens=input_tokens + 8)
+            return AIMessage(content="", tool_calls=[{"name": self.tool_name, "args": {"query": question},
+                                                      "id": call_id}], usage_metadata=usage)
+        words = (f"answer to {question}".split() * self.answer_tokens)[:self.answer_tokens]
+        usage.update(output_tokens=len(words), total_tokens=input_tokens + len(words))
+        return AIMessage(content=" ".join(words), usage_metadata=usage)
+
+    def _latency(self, message: AIMessage) -> float:
+        tokens = message.usage_metadata["output_tokens"] if message.usage_metadata else 0
+        return self.delay + (tokens / self.tokens_per_second if self.tokens_per_second else 0.0)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, tool_names: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        message = self._plan(messages, tool_names)
+        time.sleep(self._latency(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, tool_names: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        message = self._plan(messages, tool_names)
+        await asyncio.sleep(self._latency(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def install_fake_provider(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Register FakeChatModel as an LLM provider and make it the only registry profile,
+    so the agent is built through the normal registry/factory path. Returns the profile.
+    """
+    from genie.llm.factory import build_llm
+    from genie.agent.core import agent_service
+
+    build_llm.PROVIDERS[FAKE_PROVIDER_ID] = lambda cfg, model=None: FakeChatModel(**cfg.get("settings", {}))
+    profile = {"profile_name": FAKE_PROFILE_NAME, "provider_id": FAKE_PROVIDER_ID, "settings": settings}
+    # The agent service reads the (encrypted, per-user) registry through this name
+    agent_service.list_registry_profiles = lambda: [profile]
+    return profile
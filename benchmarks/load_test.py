@@ -0,0 +1,266 @@
+"""
+Offline load test for the Genie agent API.
+
+Starts the `genie` app exactly as GenieLauncher does (GenieLauncher.get_app), backed by
+a deterministic fake chat model and a local stand-in MCP server, drives /genie/ask at a
+fixed concurrency and prints (or writes) a JSON report: throughput, latency percentiles,
+status codes and the event-loop lag of the server loop. Everything runs on 127.0.0.1.
+
+    python benchmarks/load_test.py --requests 500 --concurrency 16 --output before.json
+    python benchmarks/load_test.py --llm-delay 0.2 --tokens-per-second 50 --no-tools
+
+Compare two reports with --compare before.json after.json.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx
+import uvicorn
+
+from fakes import install_fake_provider
+from report import change_pct, emit, load_results, make_report
+
+logger = logging.getLogger("genie.benchmarks.load_test")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no samples)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered) + 0.5)))
+    return round(ordered[min(rank, len(ordered)) - 1], 3)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "mean": round(sum(values) / len(values), 3) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": round(max(values), 3) if values else None,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LoopLagMonitor:
+    """Samples how late a sleep(interval) wakes up on the loop it runs on (scheduling lag)"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self.recording = False
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            if self.recording:
+                self.samples.append(max(0.0, loop.time() - expected) * 1000)
+
+
+class ServerThread:
+    """The app under test on its own event loop (thread), with a lag monitor on that loop"""
+
+    def __init__(self, app: Any, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_config=None,
+                                                    lifespan="on", access_log=False))
+        self.lag = LoopLagMonitor()
+        self._thread = threading.Thread(target=self._serve, name="genie-bench-server", daemon=True)
+
+    def _serve(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        lag_task = loop.create_task(self.lag.run())
+        try:
+            loop.run_until_complete(self.server.serve())
+        finally:
+            # Cancel and await the monitor so the loop does not close with a pending task
+            lag_task.cancel()
+            loop.run_until_complete(asyncio.gather(lag_task, return_exceptions=True))
+            loop.close()
+
+    def start(self, timeout: float = 60.0) -> None:
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Benchmark server did not start")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=30)
+
+
+def start_mcp_server(port: int, latency: float, result_chars: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve().parent / "fake_mcp_server.py"),
+         "--port", str(port), "--latency", str(latency), "--result-chars", str(result_chars)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Fake MCP server did not start")
+
+
+async def drive(base_url: str, total: int, concurrency: int, warmup: int, sessions: int,
+                timeout: float) -> Dict[str, Any]:
+    """Send `total` questions with `concurrency` clients; each client keeps its own session"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        for i in range(warmup):
+            await client.post("/genie/ask", json={"question": f"warmup question {i}"},
+                              headers={"X-Session-Id": "bench-warmup"})
+
+        async def worker(worker_id: int) -> None:
+            session_id = f"bench-{worker_id % sessions}" if sessions else None
+            for i in counter:
+                # Unique questions keep the response cache out of the measurement
+                body = {"question": f"question {i} about release performance", "session_id": session_id}
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/genie/ask", json=body)
+                    status = str(response.status_code)
+                    if response.status_code == 200 and response.json().get("status_code", 200) != 200:
+                        status = f"body_{response.json()['status_code']}"
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed = (time.perf_counter() - started) * 1000
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == "200":
+                    latencies.append(elapsed)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        duration = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "succeeded": len(latencies),
+        "status_codes": statuses,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+        "latency_ms": summarize(latencies),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mcp_port = free_port()
+    api_port = free_port()
+    work_dir = Path(tempfile.mkdtemp(prefix="genie_bench_"))
+    mcp = None
+    if args.tools:
+        mcp = start_mcp_server(mcp_port, args.tool_latency, args.tool_result_chars)
+
+    # The app reads its MCP servers from the app config, like a real deployment
+    app_config = {"log_level": args.log_level, "log_path": str(work_dir / "logs"),
+                  "mcp": {"bench_kb": {"transport": "streamable_http", "url": f"http://127.0.0.1:{mcp_port}/mcp"}}
+                  if args.tools else {}}
+    config_file = work_dir / "app_config.json"
+    config_file.write_text(json.dumps(app_config), encoding="utf-8")
+    os.environ["APP_CONFIG_FILE"] = str(config_file)
+    os.environ["MAX_TOKENS_IN_MEMORY"] = str(args.max_tokens_in_memory)
+    for name in ("GENIE_JOURNAL_DIR", "GENIE_CONVERSATION_STORE", "GENIE_TOOL_CACHE_PATH"):
+        os.environ.pop(name, None)
+
+    install_fake_provider({
+        "delay": args.llm_delay,
+        "tokens_per_second": args.tokens_per_second,
+        "answer_tokens": args.answer_tokens,
+        "tool_name": "search_knowledge_base" if args.tools else None,
+    })
+    from GenieLauncher import get_app
+    app = get_app("genie")
+
+    server = ServerThread(app, api_port)
+    try:
+        server.start()
+        # The lag monitor only records while load is applied
+        server.lag.recording = True
+        results = asyncio.run(drive(f"http://127.0.0.1:{api_port}", args.requests, args.concurrency,
+                                    args.warmup, args.sessions, args.timeout))
+        server.lag.recording = False
+    finally:
+        server.stop()
+        if mcp is not None:
+            mcp.terminate()
+            mcp.wait(timeout=10)
+
+    results["event_loop_lag_ms"] = summarize(server.lag.samples)
+    return make_report("genie_ask_load", {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+                       results)
+
+
+def compare(before_file: str, after_file: str) -> Dict[str, Any]:
+    """Relative change of the headline numbers between two reports (after vs before)"""
+    before = load_results(before_file)
+    after = load_results(after_file)
+    metrics = {"throughput_rps": (before["throughput_rps"], after["throughput_rps"])}
+    for group in ("latency_ms", "event_loop_lag_ms"):
+        for key in ("p50", "p95", "p99"):
+            metrics[f"{group}.{key}"] = (before[group][key], after[group][key])
+    return {name: {"before": old, "after": new, "change_pct": change_pct(old, new)} for name, (old, new) in metrics.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test for /genie/ask")
+    parser.add_argument("--requests", type=int, default=200, help="Questions to send (after warmup)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--sessions", type=int, default=8, help="Distinct session ids (0 = default session)")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout")
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="Fake model seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake model generation rate")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--no-tools", dest="tools", action="store_false", help="Run without the fake MCP server")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="Fake MCP tool seconds per call")
+    parser.add_argument("--tool-result-chars", type=int, default=2000)
+    parser.add_argument("--max-tokens-in-memory", type=int, default=4000)
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the app under test")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return
+
+    # Configure logging before the app is imported so it does not install its own handlers
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    emit(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Micro-benchmarks for the Kiro CLI parsing and chat-memory hot paths.
+
+Runs in-process on a corpus of captured-style Kiro CLI terminal buffers
+(benchmarks/corpus/kiro_transcripts.json) and reports, per case, ops/sec (best and
+median of several timed rounds) and allocations measured with tracemalloc (peak
+bytes during one call, bytes still held after a call).
+
+    python benchmarks/micro.py --output before.json
+    python benchmarks/micro.py --filter memory --min-time 0.2
+
+Compare two reports with --compare before.json after.json.
+
+Which parse attempts parse_json_robustly reaches depends on the optional repair
+packages (json-repair, ftfy, unidecode, fix-busted-json); the report records which
+are installed, so only compare reports taken with the same set.
+"""
+import argparse
+import gc
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from report import change_pct, emit, load_results, make_report
+
+CORPUS_FILE = Path(__file__).resolve().parent / "corpus" / "kiro_transcripts.json"
+BUFFER_SIZES = {"64k": 64 * 1024, "512k": 512 * 1024, "2m": 2 * 1024 * 1024}
+HISTORY_LENGTHS = (10, 100, 1000)
+
+# A case is a name, the callable to time and an optional untimed per-call setup whose
+# return value is passed to the callable
+Case = Tuple[str, Callable[..., Any], Optional[Callable[[], Any]]]
+
+
+def bench(fn: Callable[..., Any], setup: Optional[Callable[[], Any]] = None, min_time: float = 0.5,
+          repeats: int = 5) -> Dict[str, Any]:
+    """
+    Time fn over `repeats` rounds of roughly min_time / repeats seconds each. Without a
+    setup the round is one tight loop; with one, every call is timed on its own so the
+    setup stays out of the measurement.
+    """
+    round_time = min_time / repeats
+
+    def timed_round(loops: int) -> float:
+        if setup is None:
+            started = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            return time.perf_counter() - started
+        elapsed = 0.0
+        for _ in range(loops):
+            state = setup()
+            started = time.perf_counter()
+            fn(state)
+            elapsed += time.perf_counter() - started
+        return elapsed
+
+    # Calibrate the loop count (doubling) so one round lasts about round_time
+    loops = 1
+    while True:
+        elapsed = timed_round(loops)
+        if elapsed >= round_time or loops >= 1 << 24:
+            break
+        loops = loops * 2 if elapsed < round_time / 2 else max(loops + 1, int(loops * round_time / elapsed))
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        per_op = sorted(timed_round(loops) / loops for _ in range(repeats))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    best, median = per_op[0], statistics.median(per_op)
+    return {
+        "loops": loops,
+        "ops_per_sec": round(1 / best, 1) if best else None,
+        "ops_per_sec_median": round(1 / median, 1) if median else None,
+        "us_per_op": round(best * 1e6, 3),
+        "us_per_op_median": round(median * 1e6, 3),
+    }
+
+
+def measure_allocations(fn: Callable[..., Any], setup: Optional[Callable[[], Any]] = None,
+                        calls: int = 20) -> Dict[str, Any]:
+    """Peak traced bytes during one call (max over `calls`) and bytes retained per call"""
+    state = setup() if setup else None
+    fn(state) if setup else fn()  # warm caches and lazy imports outside the trace
+    gc.collect()
+    tracemalloc.start()
+    try:
+        peaks: List[int] = []
+        retained = 0
+        for _ in range(calls):
+            state = setup() if setup else None
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            result = fn(state) if setup else fn()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            del result
+            retained += tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_kib_per_op": round(max(peaks) / 1024, 2),
+        "retained_bytes_per_op": round(retained / calls, 1),
+    }
+
+
+def load_corpus() -> Dict[str, Dict[str, str]]:
+    with open(CORPUS_FILE, encoding="utf-8") as f:
+        return {t["name"]: t for t in json.load(f)["transcripts"]}
+
+
+def scrollback(corpus: Dict[str, Dict[str, str]], target: str, size: int) -> str:
+    """A terminal buffer of about `size` characters: earlier turns cycled from the corpus, `target` last"""
+    earlier = [t["buffer"] for name, t in sorted(corpus.items()) if name != target]
+    parts: List[str] = []
+    length = 0
+    while length < size - len(corpus[target]["buffer"]):
+        part = earlier[len(parts) % len(earlier)]
+        parts.append(part)
+        length += len(part)
+    parts.append(corpus[target]["buffer"])
+    return "".join(parts)
+
+
+def parse_cases(corpus: Dict[str, Dict[str, str]]) -> List[Case]:
+    from genie.amazonq.core.json_processor import JSONProcessor
+    from genie.amazonq.utils.json_extracter import (extract_json_block, extract_with_packages,
+                                                    normalize_preserving_code, parse_json_robustly)
+
+    processor = JSONProcessor()
+    cases: List[Case] = []
+
+    # extract_with_packages sees the same text process_and_extract_json hands it
+    for name, transcript in corpus.items():
+        if transcript["kind"] != "prompt":
+            continue
+        text = processor.process_response(transcript["user_input"], transcript["buffer"])
+        text = processor.strip_ansi_only(text).replace("\\r\\n", "\\n")
+        cases.append((f"extract_with_packages[{name}]", lambda text=text: extract_with_packages(text), None))
+
+    def parse_or_fail(raw: str) -> Any:
+        try:
+            return parse_json_robustly(raw)
+        except json.JSONDecodeError:
+            # Every attempt failed: that path is still what a broken reply costs
+            return None
+
+    for name in ("well_formed", "lightly_broken", "badly_broken"):
+        text = processor.strip_ansi_only(processor.process_response(corpus[name]["user_input"], corpus[name]["buffer"]))
+        raw, _, _ = extract_json_block(normalize_preserving_code(text))
+        cases.append((f"parse_json_robustly[{name}]", lambda raw=raw: parse_or_fail(raw), None))
+
+    for label, size in BUFFER_SIZES.items():
+        buffer = scrollback(corpus, "well_formed", size)
+        user_input = corpus["well_formed"]["user_input"]
+        cases.append((f"process_and_extract_json[{label}]",
+                      lambda buffer=buffer: processor.process_and_extract_json(user_input, buffer), None))
+    return cases
+
+
+def conversation(corpus: Dict[str, Dict[str, str]], length: int) -> List[Any]:
+    """`length` alternating user/AI messages with answers of realistic size"""
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    from genie.amazonq.core.json_processor import JSONProcessor
+
+    transcript = corpus["well_formed"]
+    answer = JSONProcessor().process_and_extract_json(transcript["user_input"], transcript["buffer"])
+    messages: List[Any] = []
+    for i in range(length // 2):
+        messages.append(HumanMessage(content=f"Question {i}: {transcript['user_input']}"))
+        messages.append(AIMessage(content=f"{answer} (turn {i})"))
+    return messages
+
+
+def memory_cases(corpus: Dict[str, Dict[str, str]]) -> List[Case]:
+    from genie.agent.config.agent_config import AgentConfig
+    from genie.agent.core.memory_manager import MemoryManager
+
+    cases: List[Case] = []
+    for length in HISTORY_LENGTHS:
+        messages = conversation(corpus, length)
+        memory = MemoryManager(AgentConfig(max_tokens_in_memory=10 ** 9))
+        for message in messages:
+            memory.chat_memory.add_message(message)
+        counts = list(memory.chat_memory.token_counts)
+        total = memory._total_tokens()
+
+        cases.append((f"memory._total_tokens[{length}]", memory._total_tokens, None))
+
+        within = MemoryManager(AgentConfig(max_tokens_in_memory=total * 2))
+        within.chat_memory.extend_counted(list(messages), counts)
+        cases.append((f"memory.trim_if_needed[{length},within_budget]", within.trim_if_needed, None))
+
+        # Over budget: half the history is dropped, so restore it before every call
+        over = MemoryManager(AgentConfig(max_tokens_in_memory=total // 2))
+
+        def restore(over=over, messages=messages, counts=counts) -> None:
+            over.chat_memory.clear()
+            over.chat_memory.extend_counted(list(messages), counts)
+
+        cases.append((f"memory.trim_if_needed[{length},over_budget]",
+                      lambda _, over=over: over.trim_if_needed(), restore))
+    return cases
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from genie.amazonq.utils import json_extracter
+
+    corpus = load_corpus()
+    cases = parse_cases(corpus) + memory_cases(corpus)
+    results: Dict[str, Any] = {}
+    for name, fn, setup in cases:
+        if args.filter and not any(f in name for f in args.filter):
+            continue
+        result = bench(fn, setup, min_time=args.min_time, repeats=args.repeats)
+        result.update(measure_allocations(fn, setup))
+        results[name] = result
+        print(f"{name:<55} {result['ops_per_sec']:>12,.1f} ops/s {result['us_per_op']:>12,.3f} us/op "
+              f"{result['peak_kib_per_op']:>10,.2f} KiB peak", file=sys.stderr)
+
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    parameters["repair_packages"] = {
+        "json_repair": json_extracter.HAS_JSON_REPAIR,
+        "ftfy": json_extracter.HAS_FTFY,
+        "unidecode": json_extracter.HAS_UNIDECODE,
+        "fix_busted_json": json_extracter.HAS_FIX_BUSTED,
+    }
+    return make_report("genie_micro", parameters, results)
+
+
+def compare(before_file: str, after_file: str) -> Dict[str, Any]:
+    """Relative change of ops/sec and peak allocation per case (after vs before)"""
+    before = load_results(before_file)
+    after = load_results(after_file)
+    changes: Dict[str, Any] = {}
+    for name in sorted(before.keys() & after.keys()):
+        changes[name] = {key: {"before": before[name][key], "after": after[name][key],
+                               "change_pct": change_pct(before[name][key], after[name][key])}
+                         for key in ("ops_per_sec", "peak_kib_per_op")}
+    return changes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for parsing and memory hot paths")
+    parser.add_argument("--filter", nargs="*", help="Only run cases whose name contains one of these")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds of timed work per case")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed rounds per case")
+    # The broken-reply cases log an expected ERROR on every call; keep handler I/O out of the timings
+    parser.add_argument("--log-level", default="CRITICAL", help="Log level while benchmarking")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    emit(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""JSON report helpers shared by the benchmark scripts, so results can be compared between commits."""
+import json
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def make_report(benchmark: str, parameters: Dict[str, Any], results: Any) -> Dict[str, Any]:
+    return {
+        "benchmark": benchmark,
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": parameters,
+        "results": results,
+    }
+
+
+def emit(report: Dict[str, Any], output: Optional[str]) -> None:
+    """Print the report and, when output is given, write it there too"""
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        Path(output).write_text(text, encoding="utf-8")
+
+
+def load_results(file_path: str) -> Any:
+    with open(file_path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def change_pct(old: Optional[float], new: Optional[float]) -> Optional[float]:
+    return round((new - old) / old * 100, 2) if old and new is not None else None
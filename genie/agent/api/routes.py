@@ -1,11 +1,14 @@
+import asyncio
+import json
 import logging
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
-from typing import List, Dict
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from typing import List, Dict, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 from langchain_core.messages import HumanMessage, AIMessage
-from ..core.agent_service import GenieAgentService
+from ..core.agent_service import GenieAgentService, MemoryLimitExceeded
+from ...metrics import REGISTRY, CONTENT_TYPE, instrument_app
 from functools import wraps
 import time 
 logger = logging.getLogger(__name__)
@@ -44,11 +47,25 @@ def calculate_processing_time(func):
 
 class PromptRequest(BaseModel):
     question: str
+    session_id: Optional[str] = None
+
+class BatchItem(BaseModel):
+    question: str
+    session_id: Optional[str] = None
+    isolated: Optional[bool] = None # run in a throwaway session (default: only when session_id is not set)
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    concurrency: Optional[int] = None # capped at batch_max_concurrency
+    isolated: bool = True # items without a session_id get their own throwaway session; False shares "default"
 
 class PromptResponse(BaseModel):
     status_code: int = 200
     answer: str
     memory_config: Dict[str, int]
+    cached: bool = False
+    request_id: Optional[str] = None
+    usage: Optional[Dict[str, int]] = None
     # timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
     timestamp: str = "0.00 s"
 	
@@ -76,6 +93,8 @@ class HealthResponse(BaseModel):
 	
 class SaveMemoryRequest(BaseModel):
 	file_path: str
+	session_id: Optional[str] = None
+	format: Optional[str] = None # "json" or "binary"; default picks binary for .gsnap file names
 
 class SaveMemoryResponse(BaseModel):
 	status_code: int = 200
@@ -85,6 +104,7 @@ class SaveMemoryResponse(BaseModel):
 
 class LoadMemoryRequest(BaseModel):
 	file_path: str
+	session_id: Optional[str] = None
 
 class LoadMemoryResponse(BaseModel):
     status_code: int = 200
@@ -106,9 +126,73 @@ class MemoryHistoryResponse(BaseModel):
 	# timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
 	timestamp: str = "0.00 s"
 
+def resolve_session_id(body_session_id: Optional[str], header_session_id: Optional[str]) -> Optional[str]:
+    '''Session id from the request body wins over the X-Session-Id header'''
+    return body_session_id or header_session_id
+
+async def cancel_on_disconnect(request: Request, awaitable):
+    '''Await `awaitable`, cancelling it if the client disconnects first.
+    The body has already been read, so the next ASGI message can only be http.disconnect.
+    '''
+    task = asyncio.ensure_future(awaitable)
+
+    async def watch():
+        while True:
+            message = await request.receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    if not task.done():
+        logger.info("Client disconnected; cancelling agent run")
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        raise HTTPException(status_code=499, detail="Client closed request")
+    return task.result()
+
+def register_agent_metrics(agent_service: GenieAgentService) -> None:
+    '''Scrape-time gauges over the agent service's caches, admission lanes and sessions'''
+    def cache_counts():
+        caches = {"response": agent_service.response_cache.stats(), "agent": agent_service.agent_cache.stats()}
+        if agent_service.tool_cache is not None:
+            caches["tool"] = agent_service.tool_cache.stats()
+        return {(name, outcome): stats.get(outcome, 0) for name, stats in caches.items() for outcome in ("hits", "misses")}
+
+    def lane_values(field):
+        return lambda: {(lane,): stats[field] for lane, stats in agent_service.admission.stats()["lanes"].items()}
+
+    REGISTRY.callback_gauge("genie_cache_lookups_total", "Cache lookups by cache and outcome",
+                            ("cache", "outcome"), cache_counts, type_name="counter")
+    REGISTRY.callback_gauge("genie_admission_queue_depth", "Requests waiting for an agent slot", ("lane",),
+                            lane_values("queue_depth"))
+    REGISTRY.callback_gauge("genie_admission_in_flight", "Agent turns currently running", ("lane",),
+                            lane_values("in_flight"))
+    REGISTRY.callback_gauge("genie_admission_avg_wait_ms", "Moving average of admission wait time", ("lane",),
+                            lane_values("avg_wait_ms"))
+    REGISTRY.callback_gauge("genie_admission_rejected_total", "Requests rejected by admission control",
+                            ("lane", "reason"), lambda: {
+                                (lane, reason): stats[f"rejected_{reason}"]
+                                for lane, stats in agent_service.admission.stats()["lanes"].items()
+                                for reason in ("queue_full", "queue_timeout")
+                            }, type_name="counter")
+    REGISTRY.callback_gauge("genie_sessions_active", "Conversations held in memory", (),
+                            lambda: {(): len(agent_service.sessions)})
+
 def create_routes(agent_service: GenieAgentService) -> FastAPI:
     '''Create routes for the Genie Agent service'''	
     app = FastAPI(title="Genie Agent API")
+    instrument_app(app, "genie")
+    register_agent_metrics(agent_service)
     
     @app.get("/genie/")
     @calculate_processing_time
@@ -133,21 +217,22 @@ def create_routes(agent_service: GenieAgentService) -> FastAPI:
     
     @app.get("/genie/memory/clear")
     @calculate_processing_time
-    async def clear_memory():
+    async def clear_memory(x_session_id: Optional[str] = Header(None)):
         logger.info("/genie/memory/clear called")
         try:
-            agent_service.memory_mgr.clear()
+            await agent_service.clear_memory(x_session_id)
             return {"status_code": 200, "message": "Memory cleared successfully", "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
     
     @app.post("/genie/memory/trim")
-    async def trim_memory():
+    async def trim_memory(x_session_id: Optional[str] = Header(None)):
         logger.info("/genie/memory/trim called")
-        before_count = len(agent_service.memory_mgr.memory.chat_memory.messages)
-        agent_service.memory_mgr.trim_if_needed()
-        after_count = len(agent_service.memory_mgr.memory.chat_memory.messages)
+        async with agent_service.locked_session(x_session_id) as session:
+            before_count = len(session.memory_mgr.chat_memory.messages)
+            session.memory_mgr.trim_if_needed()
+            after_count = len(session.memory_mgr.chat_memory.messages)
         return {
             "message": "Memory trimmed",
             "before_count": before_count,
@@ -159,6 +244,10 @@ def create_routes(agent_service: GenieAgentService) -> FastAPI:
     @calculate_processing_time
     async def update_model(req: ModelSelectRequest)->ModelSelectResponse:
         logger.info("/genie/model called")
+        if agent_service.config.workers > 1:
+            # The selection would only change the worker that happened to serve this request
+            raise HTTPException(status_code=409, detail="Model selection needs a single worker; each of the "
+                                                        f"{agent_service.config.workers} workers keeps its own model")
         try:
             await agent_service.update_model(req.profile_name, req.model_name)
             return ModelSelectResponse(status_code=200, message="Model updated successfully")
@@ -168,41 +257,118 @@ def create_routes(agent_service: GenieAgentService) -> FastAPI:
     
     @app.post("/genie/ask", response_model=PromptResponse)
     @calculate_processing_time
-    async def ask_question(req: PromptRequest)->PromptResponse:
+    async def ask_question(req: PromptRequest, request: Request, x_session_id: Optional[str] = Header(None),
+                           x_request_id: Optional[str] = Header(None))->PromptResponse:
         logger.info("/genie/ask called")
         try:
-            current_tokens = agent_service.memory_mgr._total_tokens()
-            request_tokens = agent_service.memory_mgr._estimate_tokens(req.question)
-            total_tokens = current_tokens + request_tokens
-           
-            if total_tokens >= agent_service.config.max_tokens_in_memory:
-                return PromptResponse(
-                    status_code=400,
-                    answer="Token limit reached. Please clear memory",
-                    memory_config={
-                        "max_tokens_in_memory": agent_service.config.max_tokens_in_memory,
-                        "current_tokens": total_tokens,
-                        "current_messages": len(agent_service.memory_mgr.memory.chat_memory.messages)
-                })
-            
-            answer = await agent_service.ask_question(req.question)
-            memory_config={
-                "max_tokens_in_memory": agent_service.config.max_tokens_in_memory,
-                "current_tokens": agent_service.memory_mgr._total_tokens(),
-                "current_messages": len(agent_service.memory_mgr.memory.chat_memory.messages)
-			}
-            return PromptResponse(answer=answer, memory_config=memory_config)
+            session_id = resolve_session_id(req.session_id, x_session_id)
+            # Abandoned requests stop consuming LLM tokens and MCP calls
+            result = await cancel_on_disconnect(request, agent_service.ask(req.question, session_id=session_id,
+                                                                             client_request_id=x_request_id))
+            memory_config = agent_service.memory_config(await agent_service.get_memory_mgr(session_id))
+            return PromptResponse(answer=result.answer, memory_config=memory_config, cached=result.cached,
+                                  request_id=result.request_id, usage=result.usage)
+        except MemoryLimitExceeded as e:
+            # The service trims (auto_trim_memory) before rejecting, for /genie/ask, stream and batch alike
+            return PromptResponse(status_code=400, answer=e.detail, memory_config=e.memory_config)
+        except HTTPException:
+            # Keep admission rejections (429/503 + Retry-After) and validation errors as they are
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
             # return PromptResponse(status_code=400, answer=str(e), memory_config={})
 
     @app.post("/genie/ask/stream")
-    async def ask_question_stream(req: PromptRequest):
+    async def ask_question_stream(req: PromptRequest, x_session_id: Optional[str] = Header(None),
+                                  x_request_id: Optional[str] = Header(None)):
+        logger.info("/genie/ask/stream called")
+        if not agent_service.agent:
+            raise HTTPException(status_code=503, detail="Agent not initialized")
+        if not req.question.strip():
+            raise HTTPException(status_code=400, detail="Question cannot be empty")
         return StreamingResponse(
-            agent_service.ask_question_stream(req.question),
-            media_type="text/event-stream"
+            agent_service.ask_question_stream(req.question, session_id=resolve_session_id(req.session_id, x_session_id),
+                                              client_request_id=x_request_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
 
+    @app.post("/genie/ask/batch")
+    async def ask_batch(req: BatchRequest):
+        logger.info(f"/genie/ask/batch called ({len(req.items)} items)")
+        if not agent_service.agent:
+            raise HTTPException(status_code=503, detail="Agent not initialized")
+        if not req.items:
+            raise HTTPException(status_code=400, detail="Batch has no questions")
+        if len(req.items) > agent_service.config.batch_max_items:
+            raise HTTPException(status_code=413,
+                                detail=f"Batch exceeds {agent_service.config.batch_max_items} questions")
+        max_concurrency = agent_service.config.batch_max_concurrency
+        concurrency = min(req.concurrency or max_concurrency, max_concurrency)
+        items = [{"question": item.question, "session_id": item.session_id, "isolated": item.isolated}
+                 for item in req.items]
+
+        async def ndjson():
+            started = time.perf_counter()
+            failed = 0
+            # One line per question as it completes, then a summary line
+            async for outcome in agent_service.ask_batch(items, concurrency, isolated=req.isolated):
+                failed += outcome["status_code"] != 200
+                yield json.dumps(outcome, ensure_ascii=False) + "\n"
+            yield json.dumps({"type": "summary", "total": len(items), "succeeded": len(items) - failed,
+                              "failed": failed, "concurrency": concurrency,
+                              "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.get("/genie/mcp/status")
+    async def mcp_status():
+        logger.info("/genie/mcp/status called")
+        return {"status_code": 200, "mcp_servers": agent_service.mcp_status(),
+                "timestamp": datetime.now().isoformat()}
+
+    @app.get("/metrics")
+    async def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+    @app.get("/genie/trace/{request_id}")
+    async def get_trace(request_id: str, session_id: Optional[str] = None, x_session_id: Optional[str] = Header(None)):
+        logger.info(f"/genie/trace/{request_id} called")
+        # Only the session that made the request can read its trace (question, tool arguments)
+        session_id = agent_service.sessions.normalize_id(resolve_session_id(session_id, x_session_id))
+        trace = agent_service.traces.get(request_id, session_id)
+        if trace is None:
+            raise HTTPException(status_code=404, detail=f"No trace for request {request_id}")
+        return {"status_code": 200, "trace": trace.to_dict(), "timestamp": datetime.now().isoformat()}
+
+    @app.get("/genie/admission/stats")
+    async def admission_stats():
+        logger.info("/genie/admission/stats called")
+        return {"status_code": 200, "admission": agent_service.admission.stats(),
+                "timestamp": datetime.now().isoformat()}
+
+    @app.get("/genie/routing/stats")
+    async def routing_stats():
+        logger.info("/genie/routing/stats called")
+        return {"status_code": 200, "active_profile": agent_service.active_profile.get("profile_name"),
+                "profiles": agent_service.profile_health.stats(), "timestamp": datetime.now().isoformat()}
+
+    @app.get("/genie/cache/stats")
+    async def cache_stats():
+        logger.info("/genie/cache/stats called")
+        tool_cache = agent_service.tool_cache.stats() if agent_service.tool_cache is not None else None
+        return {"status_code": 200, "response_cache": agent_service.response_cache.stats(),
+                "tool_cache": tool_cache, "timestamp": datetime.now().isoformat()}
+
+    @app.get("/genie/cache/clear")
+    async def clear_cache():
+        logger.info("/genie/cache/clear called")
+        agent_service.response_cache.clear()
+        if agent_service.tool_cache is not None:
+            agent_service.tool_cache.clear()
+        return {"status_code": 200, "message": "Response and tool caches cleared", "timestamp": datetime.now().isoformat()}
+
     @app.get("/genie/llm/profiles")	
     @calculate_processing_time
     async def list_registry_profile_names()->LLMProfilesResponse:
@@ -216,12 +382,13 @@ def create_routes(agent_service: GenieAgentService) -> FastAPI:
 
     @app.post("/genie/memory/save")	
     @calculate_processing_time
-    async def save_memory(req: SaveMemoryRequest)->SaveMemoryResponse:
+    async def save_memory(req: SaveMemoryRequest, x_session_id: Optional[str] = Header(None))->SaveMemoryResponse:
         logger.info("/genie/memory/save called")
         try:
             if req.file_path == '':
                 return SaveMemoryResponse(message="File Name is empty", status_code=400)
-            answer = agent_service.save_memory(req.file_path)
+            answer = await agent_service.save_memory(req.file_path, session_id=resolve_session_id(req.session_id, x_session_id),
+                                               format=req.format)
             return SaveMemoryResponse(message=answer)
         except Exception as e:
             # return ErrorResponse(status_code=500, message=str(e))
@@ -229,16 +396,18 @@ def create_routes(agent_service: GenieAgentService) -> FastAPI:
 			
     @app.post("/genie/memory/load")
     @calculate_processing_time
-    async def load_memory(req: LoadMemoryRequest)->LoadMemoryResponse:
+    async def load_memory(req: LoadMemoryRequest, x_session_id: Optional[str] = Header(None))->LoadMemoryResponse:
         logger.info(f"/genie/memory/load called :{req.file_path}")
         try:
             if req.file_path == '':
                 return LoadMemoryResponse(message="File Name is empty", status_code=400)
-            answer = agent_service.load_memory(req.file_path)
+            session_id = resolve_session_id(req.session_id, x_session_id)
+            answer = await agent_service.load_memory(req.file_path, session_id=session_id)
+            memory_mgr = await agent_service.get_memory_mgr(session_id)
             memory_config={
                 "max_tokens_in_memory": agent_service.config.max_tokens_in_memory,
-                "current_tokens": agent_service.memory_mgr._total_tokens(),
-                "current_messages": len(agent_service.memory_mgr.memory.chat_memory.messages)
+                "current_tokens": memory_mgr._total_tokens(),
+                "current_messages": len(memory_mgr.chat_memory.messages)
             }
             return LoadMemoryResponse(message=answer, memory_config = memory_config)
         except Exception as e:
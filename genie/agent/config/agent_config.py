@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Dict
 import os
 
 @dataclass
@@ -10,8 +11,58 @@ class AgentConfig:
     temperature: float = 0.2
     verbose: bool = True
     # memory_window: int = 10 # Number of conversation turns (user+AI pairs) to remember
+    prompt_cache_enabled: bool = True # mark system prompt, tools and older history as cacheable (Anthropic/Bedrock)
+    max_parallel_tool_calls: int = 4 # tool calls from one model step run concurrently up to this cap (0 = no cap)
     max_tokens_in_memory: int = None # token budget for retained chat history
+    auto_trim_memory: bool = True # drop the oldest turns instead of rejecting a question at the token limit
+    compaction_enabled: bool = True # summarize the oldest turns with the active LLM once memory fills up
+    compaction_trigger_ratio: float = 0.75 # fraction of max_tokens_in_memory that triggers background compaction
+    compaction_target_ratio: float = 0.5 # compaction keeps fewer verbatim turns until the kept tail fits this fraction
+    compaction_keep_turns: int = 2 # most recent user+AI turns kept verbatim (at least the last one always is)
+    response_cache_enabled: bool = True # answer repeated questions on an identical conversation from cache
+    response_cache_size: int = 256 # cached answers kept (least recently used are evicted)
+    response_cache_ttl_seconds: float = 3600 # lifetime of a cached answer
+    tool_cache_enabled: bool = True # memoize results of allow-listed MCP tools
+    tool_cache_ttls: Dict[str, float] = field(default_factory=lambda: {"search_knowledge_base": 600.0}) # allow-list: tool (or "server.tool") -> TTL seconds
+    tool_cache_size: int = 1024 # tool results kept in memory (least recently used are evicted)
+    tool_cache_path: str = None # optional SQLite file so cached tool results survive restarts
+    agent_cache_size: int = 4 # compiled agents kept per (profile, model, tool set) for instant model switches
+    mcp_pool_enabled: bool = True # keep one long-lived session per MCP server instead of one per tool call
+    mcp_health_check_interval: float = 30.0 # seconds between MCP session pings (0 disables)
+    mcp_connect_timeout: float = 10.0 # seconds to wait for an MCP session to (re)connect
+    mcp_discovery_timeout: float = 10.0 # per-server limit on tool discovery at startup
+    mcp_discovery_retry_interval: float = 30.0 # seconds between background retries for servers that did not respond
+    admission_max_concurrency: int = 8 # agent turns running at once per provider/profile
+    admission_limits: Dict[str, int] = field(default_factory=dict) # per profile name or provider id overrides of admission_max_concurrency
+    admission_queue_size: int = 32 # requests allowed to wait for a slot before answering 429
+    admission_queue_timeout: float = 30.0 # seconds a request may wait for a slot before answering 503
+    failover_enabled: bool = True # retry a failed or timed-out model call on the next registry profile
+    llm_call_timeout: float = 120.0 # seconds before a model call counts as timed out
+    latency_slo_seconds: float = 30.0 # profiles whose latency average exceeds this are tried after the others (0 = off)
+    failover_error_threshold: float = 0.5 # error-rate average above which a profile is degraded
+    failover_cooldown: float = 60.0 # seconds a degraded profile stays behind the healthy ones
+    hedge_enabled: bool = False # duplicate a slow model call onto the next profile after the current one's p95 latency
+    batch_max_concurrency: int = 4 # questions of one /genie/ask/batch call run through the agent at once
+    batch_max_items: int = 1000 # largest accepted /genie/ask/batch request
+    trace_buffer_size: int = 200 # recent request execution traces kept for /genie/trace (0 disables)
+    conversation_store: str = None # "journal" (JSONL files in journal_dir) or "sqlite" (conversation_db_path, shared by workers)
+    conversation_db_path: str = None # SQLite database of the "sqlite" conversation store
+    journal_dir: str = None # directory for append-only JSONL conversation journals (unset disables journaling)
+    journal_fsync_interval: float = 1.0 # seconds between fsyncs of the journal files
+    max_sessions: int = 100 # concurrent conversations kept in memory (least recently used idle ones are evicted)
+    workers: int = None # worker processes serving the app (set by the launcher's --workers); >1 disables /genie/model
 
     def __post_init__(self):
         if self.max_tokens_in_memory is None:
-            self.max_tokens_in_memory = int(os.getenv("MAX_TOKENS_IN_MEMORY", "4000"))
\ No newline at end of file
+            self.max_tokens_in_memory = int(os.getenv("MAX_TOKENS_IN_MEMORY", "4000"))
+        if self.journal_dir is None:
+            self.journal_dir = os.getenv("GENIE_JOURNAL_DIR") or None
+        if self.conversation_db_path is None:
+            self.conversation_db_path = os.getenv("GENIE_CONVERSATION_DB") or None
+        if self.conversation_store is None:
+            # Journaling alone (GENIE_JOURNAL_DIR) keeps selecting the journal store
+            self.conversation_store = os.getenv("GENIE_CONVERSATION_STORE") or ("journal" if self.journal_dir else None)
+        if self.workers is None:
+            self.workers = int(os.getenv("GENIE_WORKERS", "1"))
+        if self.tool_cache_path is None:
+            self.tool_cache_path = os.getenv("GENIE_TOOL_CACHE_PATH") or None
\ No newline at end of file
@@ -1,4 +1,5 @@
 from .agent_service import GenieAgentService
 from .memory_manager import MemoryManager
+from .session_store import SessionStore
 
-__all__ = ["GenieAgentService", "MemoryManager"]
\ No newline at end of file
+__all__ = ["GenieAgentService", "MemoryManager", "SessionStore"]
\ No newline at end of file
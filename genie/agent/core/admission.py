@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class _Lane:
+    """Concurrency slots and wait queue for one provider/profile"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        # stats
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.avg_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.avg_service_s: Optional[float] = None
+
+    def record_wait(self, wait_ms: float) -> None:
+        self.admitted += 1
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.avg_wait_ms = wait_ms if self.admitted == 1 else 0.8 * self.avg_wait_ms + 0.2 * wait_ms
+
+    def record_service(self, seconds: float) -> None:
+        self.avg_service_s = seconds if self.avg_service_s is None else 0.8 * self.avg_service_s + 0.2 * seconds
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: queued work divided over the slots"""
+        service = self.avg_service_s or 1.0
+        return max(1, math.ceil(service * (self.waiting + 1) / self.limit))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_queue_timeout": self.rejected_timeout,
+            "avg_wait_ms": round(self.avg_wait_ms, 2),
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "avg_service_s": round(self.avg_service_s, 3) if self.avg_service_s is not None else None,
+        }
+
+
+class AdmissionController:
+    """
+    Admission control in front of the agent: each provider/profile lane runs at most
+    `limit` agent turns at once, parks up to `queue_size` more for at most `queue_timeout`
+    seconds, and rejects the rest straight away (429 when the queue is full, 503 when the
+    wait runs out) with a Retry-After estimate instead of piling calls onto the provider.
+    Limits are looked up by profile name, then provider id, then `default_limit`.
+    """
+
+    def __init__(self, default_limit: int = 8, limits: Optional[Dict[str, int]] = None,
+                 queue_size: int = 32, queue_timeout: float = 30.0):
+        self.default_limit = default_limit
+        self.limits = dict(limits or {})
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._lanes: Dict[str, _Lane] = {}
+
+    def _lane(self, provider_id: str, profile_name: str) -> _Lane:
+        key = f"{provider_id}/{profile_name}"
+        lane = self._lanes.get(key)
+        if lane is None:
+            limit = self.limits.get(profile_name, self.limits.get(provider_id, self.default_limit))
+            lane = _Lane(max(1, limit))
+            self._lanes[key] = lane
+        return lane
+
+    @asynccontextmanager
+    async def admit(self, provider_id: str, profile_name: str) -> AsyncIterator[None]:
+        """Hold one concurrency slot of the provider/profile lane for the duration of the block"""
+        lane = self._lane(provider_id, profile_name)
+        # waiting counts requests until they hold a slot, so this is exact even before acquire() runs
+        if lane.waiting + lane.in_flight >= lane.limit + self.queue_size:
+            lane.rejected_full += 1
+            logger.warning(f"Admission queue full for {provider_id}/{profile_name} ({lane.waiting} waiting)")
+            raise HTTPException(status_code=429, detail="Too many concurrent requests, retry later",
+                                headers={"Retry-After": str(lane.retry_after())})
+
+        start = time.perf_counter()
+        lane.waiting += 1
+        try:
+            await asyncio.wait_for(lane.semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            lane.rejected_timeout += 1
+            logger.warning(f"Admission wait timed out for {provider_id}/{profile_name} after {self.queue_timeout}s")
+            raise HTTPException(status_code=503, detail="Service busy, retry later",
+                                headers={"Retry-After": str(lane.retry_after())})
+        finally:
+            lane.waiting -= 1
+
+        lane.record_wait((time.perf_counter() - start) * 1000)
+        lane.in_flight += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            lane.in_flight -= 1
+            lane.record_service(time.perf_counter() - started)
+            lane.semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_size": self.queue_size,
+            "queue_timeout": self.queue_timeout,
+            "lanes": {key: lane.stats() for key, lane in self._lanes.items()},
+        }
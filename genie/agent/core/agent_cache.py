@@ -0,0 +1,74 @@
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+AgentKey = Tuple[str, str, str]
+
+
+def config_fingerprint(profile_config: Dict[str, Any]) -> str:
+    """Hash of a stored profile config; changes whenever the profile is edited"""
+    payload = json.dumps(profile_config, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def tools_fingerprint(tools: Sequence[Any]) -> str:
+    """Hash of the tool set (name + description of every tool) an agent was compiled with"""
+    digest = hashlib.blake2b(digest_size=16)
+    for name, description in sorted((getattr(t, "name", ""), getattr(t, "description", "") or "") for t in tools):
+        digest.update(f"{name}\x00{description}\x01".encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass
+class CachedAgent:
+    """A compiled agent and the chat model client it was built on"""
+    llm: Any
+    agent: Any
+    config_fingerprint: str
+
+
+class AgentCache:
+    """
+    Bounded LRU of compiled agents keyed by (profile, model, tool-set fingerprint), so switching
+    back to a recently used model reuses the client (and its warm HTTP connections) and graph.
+    An entry is dropped when the stored config of its profile has changed.
+    """
+
+    def __init__(self, max_size: int = 4):
+        self.max_size = max_size
+        self._data: "OrderedDict[AgentKey, CachedAgent]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: AgentKey, config_fp: str) -> Optional[CachedAgent]:
+        entry = self._data.get(key)
+        if entry is not None and entry.config_fingerprint != config_fp:
+            logger.info(f"Profile config changed, evicting cached agent: {key[0]}/{key[1]}")
+            del self._data[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: AgentKey, entry: CachedAgent) -> None:
+        if self.max_size <= 0:
+            return
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            evicted, _ = self._data.popitem(last=False)
+            logger.info(f"Evicted cached agent: {evicted[0]}/{evicted[1]}")
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
@@ -1,9 +1,12 @@
 import asyncio
 import json
 import logging
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 from datetime import datetime
+from dataclasses import dataclass
 
 from langchain_core.messages import AIMessage, HumanMessage
 # from langchain.agents import create_tool_calling_agent, AgentExecutor
@@ -14,14 +17,44 @@ from langchain_core.prompts.chat import ChatPromptTemplate
 from fastapi import HTTPException
 
 
-from ...llm.factory.retrieve_llm import create_llm_from_registry
-from ...llm.profiles.registry import list_registry_profile_names
+from ...metrics import LLM_CALL_SECONDS, TOOL_CALL_SECONDS, LLM_TOKENS
+from ...llm.factory.retrieve_llm import select_registry_profile
+from ...llm.factory.build_llm import build_chat_llm
+from ...llm.profiles.registry import list_registry_profile_names, list_registry_profiles
 from ..config.agent_config import AgentConfig
 from .memory_manager import MemoryManager
+from .session_store import SessionStore, Session
+from .response_cache import CacheKey, ResponseCache
+from .mcp_pool import MCPSessionPool
+from .tool_concurrency import ToolConcurrencyMiddleware
+from .tool_cache import ToolResultCache, ToolCacheMiddleware
+from .admission import AdmissionController
+from .prompt_cache import PromptCacheMiddleware
+from .failover import FailoverMiddleware, ModelRouting, ProfileHealthTracker, StreamProgress, model_routing, stream_progress
+from .conversation_store import create_conversation_store
+from .memory_loader import load_tail
+from .snapshot import SNAPSHOT_SUFFIX, is_snapshot_file, read_snapshot, write_snapshot
+from .tracing import TraceStore, TraceCallbackHandler, ExecutionTrace, new_request_id
+from .agent_cache import AgentCache, CachedAgent, config_fingerprint, tools_fingerprint
+from .token_counter import model_key
 from langchain_core.prompts import ChatPromptTemplate
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class AskResult:
+    """Answer to one question plus how it was produced"""
+    answer: str
+    cached: bool = False
+    request_id: Optional[str] = None
+    usage: Optional[Dict[str, int]] = None
+
+class MemoryLimitExceeded(HTTPException):
+    """The question does not fit in the session's token budget, even after auto-trim"""
+    def __init__(self, memory_config: Dict[str, int]):
+        super().__init__(status_code=400, detail="Token limit reached. Please clear memory")
+        self.memory_config = memory_config
+
 class GenieAgentService:
     """Main service class for the Genie Agent"""
     SYSTEM_PROMPT = (
@@ -39,11 +72,54 @@ class GenieAgentService:
         # modern agent instance from create_agent
         self.agent = None
         self.tools = []
+        self.tools_by_server: Dict[str, List[Any]] = {}
+        self.tool_servers: Dict[str, str] = {}  # tool name -> MCP server
+        self._discovery_task: Optional[asyncio.Task] = None
         self.config = AgentConfig()
-        self.memory_mgr = MemoryManager(self.config); self.memory = self.memory_mgr.memory
+        self.mcp_pool: Optional[MCPSessionPool] = None
+        if self.config.mcp_pool_enabled:
+            self.mcp_pool = MCPSessionPool(
+                self.mcp_client,
+                health_check_interval=self.config.mcp_health_check_interval,
+                connect_timeout=self.config.mcp_connect_timeout,
+            )
+        # Journal files or a shared SQLite database; see conversation_store for the interface
+        self.store = create_conversation_store(self.config)
+        # Conversations are keyed by session id; memory_mgr/memory point at the default session
+        self.sessions = SessionStore(self.config, persistent=self.store is not None)
+        self.response_cache = ResponseCache(
+            max_size=self.config.response_cache_size if self.config.response_cache_enabled else 0,
+            ttl_seconds=self.config.response_cache_ttl_seconds,
+        )
+        self.tool_cache: Optional[ToolResultCache] = None
+        if self.config.tool_cache_enabled:
+            self.tool_cache = ToolResultCache(
+                ttls=self.config.tool_cache_ttls,
+                max_size=self.config.tool_cache_size,
+                disk_path=self.config.tool_cache_path,
+            )
+        self.admission = AdmissionController(
+            default_limit=self.config.admission_max_concurrency,
+            limits=self.config.admission_limits,
+            queue_size=self.config.admission_queue_size,
+            queue_timeout=self.config.admission_queue_timeout,
+        )
+        self.active_profile: Dict[str, Any] = {}
+        self.profile_health = ProfileHealthTracker(
+            latency_slo=self.config.latency_slo_seconds,
+            error_threshold=self.config.failover_error_threshold,
+            cooldown=self.config.failover_cooldown,
+        )
+        if self.store is not None:
+            # Restored on first use (initialize() does it eagerly)
+            self.sessions.get().needs_restore = True
+        self.memory_mgr = self.sessions.get().memory_mgr; self.memory = self.memory_mgr.memory
         # self.prompt = self._create_default_prompt()
         self.prompt = self.SYSTEM_PROMPT
         self._init_lock = asyncio.Lock()
+        self.llm = None
+        self.agent_cache = AgentCache(max_size=self.config.agent_cache_size)
+        self.traces = TraceStore(max_size=self.config.trace_buffer_size)
         self.last_scratchpad: Optional[Dict[str, Any]] = None  # Store last execution details
 
     def _create_default_prompt(self) -> ChatPromptTemplate:
@@ -62,11 +138,19 @@ class GenieAgentService:
         ])
     
     async def initialize(self) -> None:
-        """Initialize the agent with MCP tools"""
+        """Initialize the agent with MCP tools.
+        Tools are discovered from all servers concurrently with a per-server timeout; the agent
+        starts with the servers that responded and the rest are retried in the background.
+        """
         async with self._init_lock:
+            # Reload the default session from the conversation store (crash recovery)
+            await self.get_session()
+            missing: List[str] = []
             try:
                 logger.info("Loading MCP tools...")
-                self.tools = await self.mcp_client.get_tools()
+                if self.mcp_pool is not None:
+                    self.mcp_pool.start()
+                missing = await self._discover_tools(list(self.mcp_client.connections or {}))
                 logger.info(f"Loaded {len(self.tools)} MCP tools")
             except Exception as e:
                 logger.error(f"Failed to load MCP tools: {e}")
@@ -75,15 +159,101 @@ class GenieAgentService:
             await self._rebuild_agent()
             logger.info("Agent initialized successfully")
 
+        if missing:
+            self._discovery_task = asyncio.create_task(self._retry_discovery(missing), name="mcp-discovery-retry")
+
+    async def _load_server_tools(self, server_name: str) -> List[Any]:
+        if self.mcp_pool is not None:
+            # Tools bound to long-lived pooled sessions
+            return await self.mcp_pool.load_tools(server_name)
+        return await self.mcp_client.get_tools(server_name=server_name)
+
+    async def _discover_tools(self, server_names: List[str]) -> List[str]:
+        """Load tools from server_names concurrently, each bounded by mcp_discovery_timeout.
+        Merges what was found into self.tools and returns the servers that did not respond.
+        """
+        timeout = self.config.mcp_discovery_timeout
+        results = await asyncio.gather(
+            *(asyncio.wait_for(self._load_server_tools(name), timeout=timeout) for name in server_names),
+            return_exceptions=True,
+        )
+        missing: List[str] = []
+        for name, result in zip(server_names, results):
+            if isinstance(result, BaseException):
+                reason = "timed out" if isinstance(result, asyncio.TimeoutError) else str(result)
+                logger.error(f"MCP server {name} unavailable ({reason}); will retry in background")
+                missing.append(name)
+            else:
+                self.tools_by_server[name] = result
+                self.tool_servers.update({tool.name: name for tool in result})
+                logger.info(f"Loaded {len(result)} tools from MCP server {name}")
+        # Keep the configured server order so the tool set (and its fingerprint) is stable
+        self.tools = [tool for name in (self.mcp_client.connections or {}) for tool in self.tools_by_server.get(name, [])]
+        return missing
+
+    async def _retry_discovery(self, missing: List[str]) -> None:
+        """Retry unavailable MCP servers and hot-rebuild the agent as each one comes up"""
+        while missing:
+            await asyncio.sleep(self.config.mcp_discovery_retry_interval)
+            still_missing = await self._discover_tools(missing)
+            if len(still_missing) < len(missing):
+                async with self._init_lock:
+                    try:
+                        await self._rebuild_agent()
+                        logger.info(f"Agent rebuilt with {len(self.tools)} MCP tools")
+                    except Exception as e:
+                        logger.error(f"Hot agent rebuild failed: {e}")
+            missing = still_missing
+
+    async def shutdown(self) -> None:
+        """Stop background discovery and close pooled MCP sessions"""
+        if self._discovery_task is not None:
+            self._discovery_task.cancel()
+            self._discovery_task = None
+        if self.mcp_pool is not None:
+            await self.mcp_pool.stop()
+        if self.tool_cache is not None:
+            self.tool_cache.close()
+        if self.store is not None:
+            self.store.close()
+
+    def mcp_status(self) -> Dict[str, Dict[str, Any]]:
+        """Per-server MCP availability, session health and latency"""
+        pool_status = self.mcp_pool.status() if self.mcp_pool is not None else {}
+        status: Dict[str, Dict[str, Any]] = {}
+        for name in (self.mcp_client.connections or {}):
+            status[name] = {
+                "tools_loaded": len(self.tools_by_server.get(name, [])),
+                "available": name in self.tools_by_server,
+                **pool_status.get(name, {}),
+            }
+        return status
+
     # We replaced AgentExecutor with create_agent because LangChain v1+ uses a new graph-based agent design.
     # create_agent handles tool-calls internally, so we no longer build the executor manually.
     async def _rebuild_agent(self) -> None:
-        """Rebuild the agent with current configuration (latest style)."""
+        """Rebuild the agent with current configuration (latest style).
+        Compiled agents are cached by (profile, model, tool set); a cache hit is a pointer swap.
+        """
         try:
-            llm = create_llm_from_registry(
-                profile_name=self.config.profile_name,
-                model=self.config.model_name,
+            profiles = list_registry_profiles()
+            profile = select_registry_profile(self.config.profile_name, profiles)
+            # The other profiles, in registry order, are the runtime failover targets
+            fallbacks = [p for p in profiles if p is not profile] if self.config.failover_enabled else []
+            key = (
+                profile.get("profile_name", ""),
+                self.config.model_name or "",
+                tools_fingerprint(self.tools),
             )
+            config_fp = config_fingerprint({"profile": profile, "fallbacks": fallbacks})
+            cached = self.agent_cache.get(key, config_fp)
+            if cached is not None:
+                logger.info("Reusing cached agent: %s/%s", key[0], key[1])
+                self.active_profile = profile
+                self._activate(cached.llm, cached.agent)
+                return
+
+            llm = build_chat_llm(profile["provider_id"], profile, self.config.model_name)
             logger.info(
                 "Created LLM: %s/%s",
                 self.config.profile_name,
@@ -94,17 +264,33 @@ class GenieAgentService:
                 logger.error("LLM not configured (LLM value: %s)", llm)
                 raise Exception("LLM not configured")
 
-            # Update memory manager with LLM for accurate token counting
-            self.memory_mgr.set_llm(llm)
-
             # create_agent automatically manages chat_history, input, and agent_scratchpad placeholders
             # System prompt is prepended to structure the LLM's behavior and tool usage
             # Build modern agent (LangGraph-based) instead of AgentExecutor
-            self.agent = create_agent(
+            # Independent tool calls of one model step run concurrently, bounded by max_parallel_tool_calls;
+            # allow-listed tool results are served from the tool cache before taking a concurrency slot
+            middleware = [ToolConcurrencyMiddleware(self.config.max_parallel_tool_calls)]
+            if self.tool_cache is not None:
+                middleware.insert(0, ToolCacheMiddleware(self.tool_cache, lambda tool: self.tool_servers.get(tool, "")))
+            # Model calls fail over (or hedge) across registry profiles; cache breakpoints are
+            # applied inside the router so they match whichever provider serves the call
+            if self.config.failover_enabled:
+                middleware.append(FailoverMiddleware(
+                    profile, fallbacks, self.profile_health,
+                    call_timeout=self.config.llm_call_timeout,
+                    hedge_enabled=self.config.hedge_enabled,
+                ))
+            if self.config.prompt_cache_enabled:
+                middleware.append(PromptCacheMiddleware())
+            agent = create_agent(
                 model=llm,
                 tools=self.tools,
                 system_prompt= self.prompt,
+                middleware=middleware,
             )
+            self.agent_cache.put(key, CachedAgent(llm=llm, agent=agent, config_fingerprint=config_fp))
+            self.active_profile = profile
+            self._activate(llm, agent)
 
             logger.info("Agent (create_agent) created successfully")
 
@@ -112,6 +298,15 @@ class GenieAgentService:
             logger.error("Failed to build agent: %s", e, exc_info=True)
             raise
 
+    def _activate(self, llm: Any, agent: Any) -> None:
+        """Make llm/agent the active pair and point every session's token counter at llm"""
+        self.llm = llm
+        self.agent = agent
+        # Update memory managers with LLM for accurate token counting
+        for session in self.sessions.values():
+            session.memory_mgr.set_llm(llm)
+            self._schedule_token_refresh(session)
+
 
     async def update_model(self, profile_name: str, model_name: str) -> None:
         """Update the model configuration and rebuild agent"""
@@ -120,14 +315,106 @@ class GenieAgentService:
         self.config.model_name = model_name
         await self._rebuild_agent()
     
-    def get_conversation_history(self) -> list:
+    async def get_session(self, session_id: Optional[str] = None, ephemeral: bool = False) -> Session:
+        """Get (or create) the conversation session for session_id, restored from the conversation store"""
+        created = not self.sessions.exists(session_id)
+        session = self.sessions.get(session_id, ephemeral=ephemeral)
+        if created:
+            session.memory_mgr.set_llm(self.llm)
+            session.needs_restore = True
+        if session.needs_restore:
+            # Concurrent first requests for the session all wait for the same restore
+            if session.restore_task is None:
+                session.restore_task = asyncio.ensure_future(self._restore_session(session))
+            task = session.restore_task
+            try:
+                await asyncio.shield(task)
+            finally:
+                if task.done() and session.restore_task is task:
+                    session.restore_task = None
+                    # A failed restore is retried by the session's next request
+                    session.needs_restore = task.cancelled() or task.exception() is not None
+        return session
+
+    def _read_store(self, session_id: str):
+        return (self.store.version(session_id),
+                self.store.load(session_id, self.config.max_tokens_in_memory))
+
+    async def _restore_session(self, session: Session) -> None:
+        """Reload the session from the conversation store (crash recovery, or turns taken by
+        another worker), keeping the newest turns within the token budget.
+        Store reads (and the journal's flush) run in a worker thread, off the event loop."""
+        if self.store is None:
+            return
+        session.store_version, messages = await asyncio.to_thread(self._read_store, session.session_id)
+        session.memory_mgr.chat_memory.clear()
+        for msg in messages:
+            session.memory_mgr.chat_memory.add_message(msg)
+        session.memory_mgr.trim_if_needed()
+        if not session.memory_mgr.chat_memory.messages:
+            return
+        logger.info(f"Restored session {session.session_id} from conversation store ({len(session.memory_mgr.chat_memory.messages)} messages)")
+
+    async def _sync_session(self, session: Session) -> None:
+        """Reload a session another worker has written to since this process last saw it"""
+        if self.store is None:
+            return
+        version = await asyncio.to_thread(self.store.version, session.session_id)
+        if version is not None and version != session.store_version:
+            await self._restore_session(session)
+
+    async def _store_turn(self, session: Session, human: HumanMessage, ai: AIMessage) -> None:
+        if self.store is None or session.ephemeral:
+            return
+        previous = session.store_version
+        # A shared SQLite store may wait up to its busy timeout for another worker's write lock
+        version = await asyncio.to_thread(self.store.append_turn, session.session_id, [human, ai])
+        # A gap means another worker wrote in between; reload before the next turn
+        session.store_version = version if previous is not None and version == previous + 1 else None
+
+    @asynccontextmanager
+    async def locked_session(self, session_id: Optional[str] = None) -> AsyncIterator[Session]:
+        """Hold the session lock (the one a turn holds) around a change to the session's history"""
+        session = await self.get_session(session_id)
+        async with session.lock:
+            await self._sync_session(session)
+            yield session
+
+    async def clear_memory(self, session_id: Optional[str] = None) -> None:
+        """Clear a session's conversation (and record the reset in the conversation store)"""
+        async with self.locked_session(session_id) as session:
+            session.memory_mgr.clear()
+            if self.store is not None:
+                session.store_version = await asyncio.to_thread(self.store.reset, session.session_id)
+
+    async def get_memory_mgr(self, session_id: Optional[str] = None) -> MemoryManager:
+        """Get the memory manager backing session_id"""
+        session = await self.get_session(session_id)
+        if not session.lock.locked():
+            # Another worker may have moved the session on; never reload under a running turn
+            await self._sync_session(session)
+        return session.memory_mgr
+
+    async def get_conversation_history(self, session_id: Optional[str] = None) -> list:
         """Get the current conversation history"""
-        return self.memory.chat_memory.messages   
+        return (await self.get_memory_mgr(session_id)).chat_memory.messages
 
     # We replaced AgentExecutor with create_agent because LangChain v1+ uses a new graph-based agent design.
     # create_agent handles tool-calls internally, so we no longer build the executor manually.
-    async def ask_question(self, question: str) -> str:
+    async def ask_question(self, question: str, session_id: Optional[str] = None) -> str:
         """Process a question through the agent (latest create_agent style)."""
+        return (await self.ask(question, session_id=session_id)).answer
+
+    async def ask(self, question: str, session_id: Optional[str] = None, request_id: Optional[str] = None,
+                  client_request_id: Optional[str] = None) -> AskResult:
+        """Process a question and report whether the answer came from the response cache.
+        The question must fit in the session's token budget (see _fit_question).
+        Turns within one session are serialized by the session lock; different
+        sessions run the agent concurrently, bounded per provider/profile by the
+        admission controller (429/503 with Retry-After when saturated).
+        The trace id is generated here (request_id is only for internal callers);
+        a client's X-Request-Id is kept on the trace as client_request_id.
+        """
         if not self.agent:
             raise HTTPException(status_code=503, detail="Agent not initialized")
 
@@ -135,39 +422,330 @@ class GenieAgentService:
         if not question:
             raise HTTPException(status_code=400, detail="Question cannot be empty")
 
+        session = await self.get_session(session_id)
+        request_id = request_id or new_request_id()
+        async with session.lock:
+            await self._sync_session(session)
+            self._fit_question(session, question)
+            # Identical question on an identical conversation: answered without the agent
+            # graph, so it does not take (or wait for) an admission slot
+            # Keyed on the profile and model actually in use, not the (possibly empty) configured names
+            cache_key = self.response_cache.make_key(
+                self.active_profile.get("profile_name", ""), model_key(self.llm),
+                session.memory_mgr.chat_memory.messages, question
+            )
+            trace = self.traces.start(request_id, session.session_id, question, client_request_id)
+            cached = await self._answer_from_cache(session, question, trace, cache_key)
+            if cached is not None:
+                return cached
+            try:
+                async with self._admit():
+                    return await self._ask_in_session(session, question, trace, cache_key)
+            except HTTPException as e:
+                if trace.ended_at is None:
+                    self._store_scratchpad_info(trace, "rejected", str(e.detail))
+                raise
+
+    def _fit_question(self, session: Session, question: str) -> None:
+        """
+        Make room for the question in the session's token budget (caller holds the session lock).
+        With auto_trim_memory the oldest turns are dropped first; MemoryLimitExceeded if it still does not fit.
+        """
+        memory_mgr = session.memory_mgr
+        request_tokens = memory_mgr.count_tokens(question)
+        if self.config.auto_trim_memory and not memory_mgr.fits(request_tokens):
+            memory_mgr.trim_if_needed(reserve_tokens=request_tokens)
+        if not memory_mgr.fits(request_tokens):
+            raise MemoryLimitExceeded(self.memory_config(memory_mgr, request_tokens))
+
+    def memory_config(self, memory_mgr: MemoryManager, incoming_tokens: int = 0) -> Dict[str, int]:
+        """Token budget and current usage of a session, as reported by the API"""
+        return {
+            "max_tokens_in_memory": self.config.max_tokens_in_memory,
+            "current_tokens": memory_mgr._total_tokens() + incoming_tokens,
+            "current_messages": len(memory_mgr.chat_memory.messages),
+        }
+
+    def _admit(self):
+        """Admission slot of the active provider/profile for one agent run"""
+        return self.admission.admit(self.active_profile.get("provider_id", ""),
+                                    self.active_profile.get("profile_name", self.config.profile_name))
+
+    async def _answer_from_cache(self, session: Session, question: str, trace: ExecutionTrace,
+                           cache_key: CacheKey) -> Optional[AskResult]:
+        cached = self.response_cache.get(cache_key)
+        if cached is None:
+            return None
+        logger.info("Response cache hit [%s]", session.session_id)
+        human, ai = HumanMessage(content=question), AIMessage(content=cached)
+        session.memory_mgr.chat_memory.add_message(human)
+        session.memory_mgr.chat_memory.add_message(ai)
+        await self._store_turn(session, human, ai)
+        self._schedule_token_refresh(session)
+        self._store_scratchpad_info(trace, "cached")
+        return AskResult(answer=cached, cached=True, request_id=trace.request_id)
+
+    async def _ask_in_session(self, session: Session, question: str, trace: ExecutionTrace,
+                              cache_key: CacheKey) -> AskResult:
+        memory_mgr = session.memory_mgr
+        request_id = trace.request_id
         try:
-            logger.info("Processing question: %s...", question[:100])
+            logger.info("Processing question [%s]: %s...", session.session_id, question[:100])
 
-            # 1) Add user message to memory
-            self.memory.chat_memory.add_message(HumanMessage(content=question))
-
-            # 2) Build state for the agent: full conversation as `messages`
+            # 1) Build state for the agent: a snapshot of the conversation plus the new question.
+            #    Memory is only written once the run has finished, so a cancelled run
+            #    (client disconnect) leaves no dangling HumanMessage behind.
+            human = HumanMessage(content=question)
             state = {
-                "messages": self.memory.chat_memory.messages
+                "messages": list(memory_mgr.chat_memory.messages) + [human]
             }
 
-            # 3) Run the agent
+            # 2) Run the agent
+            routing = ModelRouting()
+            model_routing.set(routing)
             response_state = await self.agent.ainvoke(
                 state,
-                config={"recursion_limit": self.config.max_iterations},
+                config={"recursion_limit": self.config.max_iterations,
+                        "callbacks": [TraceCallbackHandler(trace)]},
             )
 
-            # 4) Extract answer
+            # 3) Extract answer
             result = self._process_response(response_state)
 
-            # 5) Add assistant reply to memory
-            self.memory.chat_memory.add_message(AIMessage(content=result))
-
-            # 6) Optional: store debug info + trim memory
-            # self._store_scratchpad_info(response_state, question)
-            self.memory_mgr.check_memory_status()
-
-            return result
-
+            # 4) Add the turn to memory (and persist it to the conversation store)
+            ai = AIMessage(content=result)
+            memory_mgr.chat_memory.add_message(human)
+            memory_mgr.chat_memory.add_message(ai)
+            await self._store_turn(session, human, ai)
+
+            # 5) Store debug info + trim memory
+            self._store_scratchpad_info(trace)
+            memory_mgr.check_memory_status()
+            self._schedule_token_refresh(session)
+            self._schedule_compaction(session)
+            if routing.fallback_calls:
+                # The key names the primary profile; a fallback's answer must not be served as its
+                logger.info("Answer came from a fallback profile; not caching it")
+            else:
+                self.response_cache.put(cache_key, result)
+
+            return AskResult(answer=result, request_id=request_id, usage=self._usage(trace))
+
+        except asyncio.CancelledError:
+            logger.info("Agent run cancelled [%s]; conversation left unchanged", session.session_id)
+            self._store_scratchpad_info(trace, "cancelled")
+            raise
         except Exception as e:
             logger.error("Error processing question: %s", e)
+            self._store_scratchpad_info(trace, "error", str(e))
             raise HTTPException(status_code=500, detail=str(e))
 
+    async def ask_batch(self, items: List[Dict[str, Any]], concurrency: int,
+                        isolated: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """Answer independent questions concurrently, yielding one result per item as it completes.
+        Each item is {"question", "session_id", "isolated"}; an isolated item runs in a throwaway
+        session that is dropped afterwards. An item's own "isolated" wins; otherwise an item with a
+        session_id runs in that session and one without follows the batch's `isolated` (so by
+        default batch questions neither share nor pollute the "default" conversation).
+        A failing item is reported with its status code and error instead of failing the batch.
+        Cancelling the iteration cancels the pending items.
+        """
+        batch_id = new_request_id()[:12]
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        def is_isolated(item: Dict[str, Any]) -> bool:
+            if item.get("isolated") is not None:
+                return item["isolated"]
+            return not item.get("session_id") and isolated
+
+        async def run(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                session_id = item.get("session_id")
+                throwaway = is_isolated(item)
+                if throwaway:
+                    session_id = f"batch-{batch_id}-{index}"
+                    await self.get_session(session_id, ephemeral=True)
+                outcome: Dict[str, Any] = {"type": "result", "index": index,
+                                           "session_id": self.sessions.normalize_id(session_id)}
+                started = time.perf_counter()
+                try:
+                    result = await self.ask(item["question"], session_id=session_id,
+                                            request_id=f"{batch_id}-{index}")
+                    outcome.update(status_code=200, answer=result.answer, cached=result.cached,
+                                   request_id=result.request_id, usage=result.usage)
+                except HTTPException as e:
+                    outcome.update(status_code=e.status_code, error=str(e.detail))
+                except Exception as e:
+                    outcome.update(status_code=500, error=str(e))
+                finally:
+                    if throwaway:
+                        self.sessions.delete(session_id)
+                outcome["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                return outcome
+
+        logger.info(f"Batch {batch_id}: {len(items)} questions, concurrency {concurrency}")
+        tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def ask_question_stream(self, question: str, session_id: Optional[str] = None,
+                                  client_request_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream an answer as server-sent events built from the agent's astream_events.
+        Emits `token` events while the model generates, `tool_start`/`tool_end` around
+        tool calls, and a final `end` event. The turn is written to memory only once
+        the stream has completed, so an aborted stream leaves the history untouched.
+        """
+        if not self.agent:
+            yield self._sse("error", {"status_code": 503, "message": "Agent not initialized"})
+            return
+
+        question = question.strip()
+        if not question:
+            yield self._sse("error", {"status_code": 400, "message": "Question cannot be empty"})
+            return
+
+        session = await self.get_session(session_id)
+        async with session.lock:
+            await self._sync_session(session)
+            memory_mgr = session.memory_mgr
+            try:
+                self._fit_question(session, question)
+            except MemoryLimitExceeded as e:
+                yield self._sse("error", {"status_code": e.status_code, "message": e.detail,
+                                          "memory_config": e.memory_config})
+                return
+            human = HumanMessage(content=question)
+            state = {"messages": list(memory_mgr.chat_memory.messages) + [human]}
+            final_state: Any = None
+            streamed: List[str] = []
+            request_id = new_request_id()
+            trace = self.traces.start(request_id, session.session_id, question, client_request_id)
+            logger.info("Streaming question [%s]: %s...", session.session_id, question[:100])
+            # No hedging, and no failover once a model call has streamed tokens (see failover.stream_progress)
+            progress = StreamProgress()
+            stream_progress.set(progress)
+            try:
+                # Same provider/profile concurrency and queue limits as /genie/ask
+                async with self._admit():
+                    async for event in self.agent.astream_events(
+                        state,
+                        config={"recursion_limit": self.config.max_iterations,
+                                "callbacks": [TraceCallbackHandler(trace), progress]},
+                        version="v2",
+                    ):
+                        kind = event.get("event")
+                        data = event.get("data", {})
+                        if kind == "on_chat_model_start":
+                            # Only the last model call carries the final answer
+                            streamed = []
+                        elif kind == "on_chat_model_stream":
+                            text = self._chunk_text(data.get("chunk"))
+                            if text:
+                                streamed.append(text)
+                                yield self._sse("token", {"text": text})
+                        elif kind == "on_tool_start":
+                            yield self._sse("tool_start", {"name": event.get("name"), "run_id": event.get("run_id"),
+                                                           "input": data.get("input")})
+                        elif kind == "on_tool_end":
+                            output = data.get("output")
+                            yield self._sse("tool_end", {"name": event.get("name"), "run_id": event.get("run_id"),
+                                                         "output": str(getattr(output, "content", output))})
+                        elif kind == "on_chain_end" and not event.get("parent_ids"):
+                            final_state = data.get("output")
+
+                result = self._process_response(final_state) if final_state else "".join(streamed)
+
+                ai = AIMessage(content=result)
+                memory_mgr.chat_memory.add_message(human)
+                memory_mgr.chat_memory.add_message(ai)
+                await self._store_turn(session, human, ai)
+                memory_mgr.check_memory_status()
+                self._schedule_token_refresh(session)
+                self._schedule_compaction(session)
+                self._store_scratchpad_info(trace)
+
+                yield self._sse("end", {
+                    "answer": result,
+                    "request_id": request_id,
+                    "usage": self._usage(trace),
+                    "memory_config": self.memory_config(memory_mgr),
+                })
+            except HTTPException as e:
+                # Admission rejected the run (queue full or wait timed out)
+                self._store_scratchpad_info(trace, "rejected", str(e.detail))
+                yield self._sse("error", {"status_code": e.status_code, "message": e.detail,
+                                          "retry_after": (e.headers or {}).get("Retry-After")})
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client went away mid-stream (task cancelled, or the generator closed
+                # while suspended at a yield); nothing was written to memory
+                logger.info("Stream cancelled [%s]; conversation left unchanged", session.session_id)
+                self._store_scratchpad_info(trace, "cancelled")
+                raise
+            except Exception as e:
+                logger.error("Error streaming question: %s", e)
+                self._store_scratchpad_info(trace, "error", str(e))
+                yield self._sse("error", {"status_code": 500, "message": str(e)})
+
+    def _store_scratchpad_info(self, trace: ExecutionTrace, status: str = "ok", error: Optional[str] = None) -> None:
+        """Close the request's trace and keep it as the last execution details"""
+        trace.finish(status, error)
+        for step in trace.steps:
+            seconds = (step.duration_ms or 0) / 1000
+            if step.kind == "llm":
+                LLM_CALL_SECONDS.observe(seconds, model=step.name, status=step.status)
+                LLM_TOKENS.inc(step.input_tokens or 0, model=step.name, direction="input")
+                LLM_TOKENS.inc(step.output_tokens or 0, model=step.name, direction="output")
+                LLM_TOKENS.inc(step.cache_read_tokens or 0, model=step.name, direction="cache_read")
+                LLM_TOKENS.inc(step.cache_write_tokens or 0, model=step.name, direction="cache_write")
+            else:
+                TOOL_CALL_SECONDS.observe(seconds, tool=step.name, status=step.status)
+        self.last_scratchpad = trace.to_dict()
+        summary = self.last_scratchpad["summary"]
+        logger.info(
+            "Request %s %s in %sms (llm %sms x%d, tools %sms x%d)", trace.request_id, status,
+            self.last_scratchpad["duration_ms"], summary["llm_ms"], summary["llm_calls"],
+            summary["tool_ms"], summary["tool_calls"],
+        )
+
+    @staticmethod
+    def _usage(trace: ExecutionTrace) -> Dict[str, int]:
+        """Token usage of one request, including prompt-cache reads and writes"""
+        summary = trace.to_dict()["summary"]
+        return {key: summary[key] for key in
+                ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")}
+
+    def _schedule_compaction(self, session: Session) -> None:
+        """Start background compaction for a session whose memory is filling up"""
+        if not session.memory_mgr.needs_compaction():
+            return
+        if session.compaction_task and not session.compaction_task.done():
+            return
+        session.compaction_task = asyncio.create_task(session.memory_mgr.compact(session.lock))
+
+    def _schedule_token_refresh(self, session: Session) -> None:
+        """Count new messages with the provider's counter in the background"""
+        if not session.memory_mgr.token_counter.native:
+            return
+        if session.token_task and not session.token_task.done():
+            return
+        session.token_task = asyncio.create_task(session.memory_mgr.refine_token_counts())
+
+    @staticmethod
+    def _sse(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> str:
+        """Text of a streamed message chunk (Anthropic/Bedrock stream content as a list of blocks)"""
+        content = getattr(chunk, "content", "")
+        if isinstance(content, list):
+            return "".join(item.get("text", "") for item in content if isinstance(item, dict))
+        return content or ""
+
     # create_agent produces empty AI messages when calling tools, so we must ignore those.
     # The correct final output is always the last non-empty AIMessage in the returned state.
     def _process_response(self, response: Any) -> str:
@@ -198,17 +776,29 @@ class GenieAgentService:
         return profiles
 
 
-    def save_memory(self, file_path: str) -> str:
-        """Save conversation memory to a JSON file"""
+    async def save_memory(self, file_path: str, session_id: Optional[str] = None, format: Optional[str] = None) -> str:
+        """Save conversation memory to a JSON file.
+        With journaling enabled this is a copy of the session's journal (load_memory reads both formats).
+        format="binary" (or a .gsnap file name) writes a compressed snapshot with cached token counts.
+        """
         try:            
+            if format == "binary" or (format is None and str(file_path).endswith(SNAPSHOT_SUFFIX)):
+                return await self._save_snapshot(file_path, session_id)
+            if self.store is not None:
+                session = await self.get_session(session_id)
+                # The journal copy waits for its writer thread, so it runs off the event loop
+                if await asyncio.to_thread(self.store.snapshot, session.session_id, file_path):
+                    logger.info(f"Conversation journal copied to {file_path}")
+                    return str(file_path)
+            memory_mgr = await self.get_memory_mgr(session_id)
             # Get conversation history
-            messages = self.memory.chat_memory.messages
+            messages = list(memory_mgr.chat_memory.messages)
             
             # Format messages for JSON
             conversation_data = {
                 "timestamp": datetime.now().isoformat(),
                 "total_messages": len(messages),
-                "total_tokens": self.memory_mgr._total_tokens(),
+                "total_tokens": memory_mgr._total_tokens(),
                 "messages": []
             }
             
@@ -239,19 +829,50 @@ class GenieAgentService:
             logger.error(f"Failed to save memory: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to save memory: {str(e)}")
 
-    def load_memory(self, file_path: str) -> str:
-        """Load conversation memory from a JSON file"""
+    async def _save_snapshot(self, file_path: str, session_id: Optional[str] = None) -> str:
+        memory_mgr = await self.get_memory_mgr(session_id)
+        # Copies taken on the loop; compressing and writing them happens in a worker thread
+        size = await asyncio.to_thread(
+            write_snapshot,
+            file_path,
+            list(memory_mgr.chat_memory.messages),
+            list(memory_mgr.chat_memory.token_counts),
+            {
+                "profile_name": self.config.profile_name,
+                "model_name": self.config.model_name,
+                "token_model": memory_mgr.token_counter.model,
+            },
+        )
+        logger.info(f"Conversation snapshot saved to {file_path} ({size} bytes)")
+        return str(file_path)
+
+    def _read_memory_file(self, file_path: str):
+        """(header, messages, token_counts) of a binary snapshot, or (None, messages, None) of a JSON/journal file"""
+        if is_snapshot_file(file_path):
+            return read_snapshot(file_path)
+        return None, load_tail(file_path, self.config.max_tokens_in_memory), None
+
+    async def load_memory(self, file_path: str, session_id: Optional[str] = None) -> str:
+        """Load conversation memory from a JSON file, a journal copy or a binary snapshot (detected from the file).
+        Only the newest turns that fit in max_tokens_in_memory are read (see memory_loader.load_tail).
+        """
         try:            
-            # Load conversation history into memory
-            with open(file_path, 'r', encoding='utf-8') as f:
-                conversation_data = json.load(f)
-            self.memory.chat_memory.clear()
-            for msg in conversation_data["messages"]:
-                # Create proper message objects based on role
-                if msg["role"] == "user":
-                    self.memory.chat_memory.add_message(HumanMessage(content=msg["content"]))
-                else:  # assistant
-                    self.memory.chat_memory.add_message(AIMessage(content=msg["content"]))
+            # Reading and parsing a large file takes a while; do it in a worker thread
+            # before taking the session lock so neither the loop nor the session waits on it
+            header, messages, token_counts = await asyncio.to_thread(self._read_memory_file, file_path)
+            async with self.locked_session(session_id) as session:
+                memory_mgr = session.memory_mgr
+                if header is not None:
+                    memory_mgr.restore(messages, token_counts, header.get("token_model", ""))
+                else:
+                    memory_mgr.chat_memory.clear()
+                    for msg in messages:
+                        memory_mgr.chat_memory.add_message(msg)
+                # The selection used estimated tokens; settle on the active model's counts
+                memory_mgr.trim_if_needed()
+                if self.store is not None:
+                    session.store_version = await asyncio.to_thread(self.store.reset, session.session_id,
+                                                                    list(memory_mgr.chat_memory.messages))
             logger.info(f"Conversation loaded from {file_path}")
             return str(file_path)
         except Exception as e:
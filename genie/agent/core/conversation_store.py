@@ -0,0 +1,131 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from ..config.agent_config import AgentConfig
+from .journal import ConversationJournal, message_record, record_message
+from .memory_loader import select_tail
+from .token_counter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# A conversation store persists every session's turns outside the process. Backends provide:
+#   append_turn(session_id, messages) -> Optional[int]   store version after the write
+#   reset(session_id, messages=None)  -> Optional[int]   replace (or clear) the conversation
+#   load(session_id, max_tokens)      -> List[BaseMessage]  newest turns within the budget
+#   version(session_id)               -> Optional[int]   changes on every write (None: process-local)
+#   snapshot(session_id, file_path)   -> Optional[str]   copy for save_memory (None: not supported)
+#   close()
+# Methods may block (file I/O, SQLite locks held by other workers); the service calls them
+# through asyncio.to_thread, never on the event loop.
+STORE_BACKENDS = ("journal", "sqlite")
+
+
+class SQLiteConversationStore:
+    """
+    Conversation store in one SQLite database (WAL mode), shared by every worker process.
+    Messages are keyed by (session, turn, seq), so loading the newest turns of a session
+    walks the primary key backwards; sessions.version is bumped on every write so a worker
+    can tell with one indexed lookup whether another worker has moved a session on.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=busy_timeout, check_same_thread=False,
+                                     isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "session_id TEXT NOT NULL, turn INTEGER NOT NULL, seq INTEGER NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL, tokens INTEGER NOT NULL, "
+                "PRIMARY KEY (session_id, turn, seq)) WITHOUT ROWID"
+            )
+        logger.info(f"Conversation store at {self.path}")
+
+    def _write(self, session_id: str, messages: List[BaseMessage], replace: bool) -> int:
+        records = [message_record(m) for m in messages]
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so concurrent workers get distinct turn numbers
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                version = (row[0] if row else 0) + 1
+                self._conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (session_id, version, time.time()))
+                if replace:
+                    self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                self._conn.executemany(
+                    "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                    [(session_id, version, seq, r["role"], r["content"], estimate_tokens(r["content"]))
+                     for seq, r in enumerate(records)],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return version
+
+    def append_turn(self, session_id: str, messages: List[BaseMessage]) -> int:
+        return self._write(session_id, messages, replace=False)
+
+    def reset(self, session_id: str, messages: Optional[List[BaseMessage]] = None) -> int:
+        return self._write(session_id, messages or [], replace=True)
+
+    def version(self, session_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, session_id: str, max_tokens: int) -> List[BaseMessage]:
+        newest_first: List[Tuple[str, str, int]] = []
+        total = 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT role, content, tokens FROM messages WHERE session_id = ? ORDER BY turn DESC, seq DESC",
+                (session_id,),
+            )
+            for role, content, tokens in cursor:
+                newest_first.append((role, content, tokens))
+                total += tokens
+                if total > max_tokens and len(newest_first) > 2:
+                    break
+            cursor.close()
+        newest_first.reverse()
+        start = select_tail([(tokens, role == "user") for role, _, tokens in newest_first], max_tokens)
+        return [record_message({"role": role, "content": content}) for role, content, _ in newest_first[start:]]
+
+    def snapshot(self, session_id: str, file_path: str) -> Optional[str]:
+        # save_memory writes its JSON document from the in-memory session instead
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_conversation_store(config: AgentConfig):
+    """The configured conversation store (None when conversations are kept in memory only)"""
+    backend = (config.conversation_store or "").lower()
+    if not backend:
+        return None
+    if backend == "journal":
+        if not config.journal_dir:
+            raise ValueError("conversation_store 'journal' requires journal_dir (GENIE_JOURNAL_DIR)")
+        return ConversationJournal(config.journal_dir, config.journal_fsync_interval)
+    if backend == "sqlite":
+        if not config.conversation_db_path:
+            raise ValueError("conversation_store 'sqlite' requires conversation_db_path (GENIE_CONVERSATION_DB)")
+        return SQLiteConversationStore(config.conversation_db_path)
+    raise ValueError(f"Unknown conversation_store {backend!r}; expected one of {STORE_BACKENDS}")
@@ -0,0 +1,296 @@
+import asyncio
+import contextvars
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+import httpx
+from langchain.agents.middleware import AgentMiddleware
+from langchain.agents.middleware.types import ModelRequest
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from ...llm.factory.build_llm import build_chat_llm
+
+logger = logging.getLogger(__name__)
+
+LATENCY_SAMPLES = 100
+MIN_HEDGE_SAMPLES = 10
+
+
+class StreamProgress(AsyncCallbackHandler):
+    """Callback of a streaming turn counting the model tokens already on their way to the client"""
+
+    def __init__(self):
+        self.tokens = 0
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.tokens += 1
+
+
+# Set (to the turn's StreamProgress) for streaming turns. Hedging is off there, since both
+# calls would stream tokens, and a model call that has streamed a token is not failed over,
+# so the client never receives the start of one answer followed by another.
+stream_progress: contextvars.ContextVar[Optional[StreamProgress]] = contextvars.ContextVar(
+    "genie_stream_progress", default=None)
+
+class ModelRouting:
+    """Which profiles answered the model calls of one agent run"""
+
+    def __init__(self):
+        self.fallback_calls = 0
+
+
+# Set by the service for non-streaming turns so it can tell whether a fallback profile
+# produced (part of) the answer
+model_routing: contextvars.ContextVar[Optional[ModelRouting]] = contextvars.ContextVar(
+    "genie_model_routing", default=None)
+
+# Provider errors worth another profile: rate limits, overload and server errors. Other 4xx
+# (auth, validation, context length) would fail the same way on every profile.
+TRANSIENT_STATUS_CODES = {408, 429}
+TRANSIENT_ERROR_NAMES = ("Timeout", "Connection", "RateLimit", "Throttling", "Overloaded",
+                         "ServiceUnavailable", "InternalServer")
+
+
+def _status_code(e: BaseException) -> Optional[int]:
+    code = getattr(e, "status_code", None)
+    response = getattr(e, "response", None)
+    if code is None and isinstance(response, dict):
+        # botocore ClientError
+        code = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    elif code is None and response is not None:
+        code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_transient(e: BaseException) -> bool:
+    """Timeouts, connection failures, 429 and 5xx (the error or the one it was raised from)"""
+    for error in (e, e.__cause__):
+        if error is None:
+            continue
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TimeoutException, httpx.NetworkError)):
+            return True
+        code = _status_code(error)
+        if code is not None:
+            return code in TRANSIENT_STATUS_CODES or code >= 500
+        if any(name in type(error).__name__ for name in TRANSIENT_ERROR_NAMES):
+            return True
+    return False
+
+
+class _ProfileHealth:
+    """Latency and error history of one registry profile"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.slo_breaches = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.avg_latency_s: Optional[float] = None
+        self.error_rate = 0.0
+        self.cooldown_until = 0.0
+        self.samples: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, seconds: float, outcome: str) -> None:
+        self.calls += 1
+        failed = outcome != "ok"
+        self.error_rate = 0.8 * self.error_rate + (0.2 if failed else 0.0)
+        if outcome == "timeout":
+            self.timeouts += 1
+        elif failed:
+            self.errors += 1
+        else:
+            self.samples.append(seconds)
+            self.avg_latency_s = seconds if self.avg_latency_s is None else 0.8 * self.avg_latency_s + 0.2 * seconds
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "slo_breaches": self.slo_breaches,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "error_rate": round(self.error_rate, 3),
+            "avg_latency_s": round(self.avg_latency_s, 3) if self.avg_latency_s is not None else None,
+            "p95_latency_s": round(p95, 3) if p95 is not None else None,
+            "degraded": self.cooldown_until > time.monotonic(),
+        }
+
+
+class ProfileHealthTracker:
+    """
+    Per-profile latency EWMA, p95 and error rate of model calls. A profile whose error
+    rate or latency average crosses its threshold is degraded for `cooldown` seconds:
+    routing tries it after the healthy profiles, then lets real traffic probe it again.
+    Lives on the service, so health survives agent rebuilds.
+    """
+
+    def __init__(self, latency_slo: float, error_threshold: float, cooldown: float):
+        self.latency_slo = latency_slo
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self._profiles: Dict[str, _ProfileHealth] = {}
+
+    def _health(self, name: str) -> _ProfileHealth:
+        health = self._profiles.get(name)
+        if health is None:
+            health = self._profiles[name] = _ProfileHealth()
+        return health
+
+    def record(self, name: str, seconds: float, outcome: str) -> None:
+        health = self._health(name)
+        health.record(seconds, outcome)
+        if outcome == "ok" and self.latency_slo and seconds > self.latency_slo:
+            health.slo_breaches += 1
+        slow = self.latency_slo and (health.avg_latency_s or 0.0) > self.latency_slo
+        if health.error_rate > self.error_threshold or slow:
+            if health.cooldown_until <= time.monotonic():
+                reason = f"error rate {health.error_rate:.2f}" if not slow else f"latency {health.avg_latency_s:.2f}s"
+                logger.warning(f"Profile {name} degraded ({reason}); preferring fallbacks for {self.cooldown:.0f}s")
+            health.cooldown_until = time.monotonic() + self.cooldown
+
+    def record_hedge(self, name: str, won: bool) -> None:
+        health = self._health(name)
+        health.hedges += 1
+        health.hedge_wins += int(won)
+
+    def degraded(self, name: str) -> bool:
+        return self._health(name).cooldown_until > time.monotonic()
+
+    def p95(self, name: str) -> Optional[float]:
+        return self._health(name).p95()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: health.stats() for name, health in self._profiles.items()}
+
+
+class FailoverMiddleware(AgentMiddleware):
+    """
+    Routes every model call of the agent across the ordered registry profiles.
+    The configured profile is tried first and the others follow in registry order
+    (healthy before degraded). A call that fails transiently (timeout, `call_timeout`,
+    connection error, 429, 5xx) is retried on the next profile; other errors, and any
+    error once a streaming call has sent tokens, are raised as they are. With hedging on,
+    a duplicate call goes to the next profile once the current one has been running for
+    its p95 latency, and the first answer wins.
+    Fallback LLMs are built on first use with each profile's own default model.
+    """
+
+    def __init__(self, primary: Dict[str, Any], fallbacks: List[Dict[str, Any]], health: ProfileHealthTracker,
+                 call_timeout: float, hedge_enabled: bool = False):
+        super().__init__()
+        self.primary = primary
+        self.fallbacks = fallbacks
+        self.health = health
+        self.call_timeout = call_timeout
+        self.hedge_enabled = hedge_enabled
+        self._llms: Dict[str, Any] = {}
+
+    @staticmethod
+    def _name(profile: Dict[str, Any]) -> str:
+        return profile.get("profile_name") or profile.get("provider_id", "")
+
+    def _candidates(self) -> List[Dict[str, Any]]:
+        ordered = [self.primary] + self.fallbacks
+        healthy = [p for p in ordered if not self.health.degraded(self._name(p))]
+        return healthy + [p for p in ordered if self.health.degraded(self._name(p))]
+
+    def _route(self, request: ModelRequest, profile: Dict[str, Any]) -> ModelRequest:
+        if profile is self.primary:
+            return request
+        name = self._name(profile)
+        llm = self._llms.get(name)
+        if llm is None:
+            llm = self._llms[name] = build_chat_llm(profile["provider_id"], profile)
+        return request.override(model=llm)
+
+    async def _attempt(self, profile: Dict[str, Any], request: ModelRequest,
+                       handler: Callable[[ModelRequest], Awaitable[Any]]) -> Any:
+        name = self._name(profile)
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(handler(self._route(request, profile)), timeout=self.call_timeout)
+        except asyncio.TimeoutError:
+            self.health.record(name, time.monotonic() - started, "timeout")
+            raise
+        except Exception as e:
+            # A rejected request (4xx) says nothing about the profile's health
+            if is_transient(e):
+                self.health.record(name, time.monotonic() - started, "error")
+            raise
+        self.health.record(name, time.monotonic() - started, "ok")
+        routing = model_routing.get()
+        if routing is not None and profile is not self.primary:
+            routing.fallback_calls += 1
+        return response
+
+    async def _hedged(self, profile: Dict[str, Any], hedge: Dict[str, Any], delay: float, request: ModelRequest,
+                      handler: Callable[[ModelRequest], Awaitable[Any]], tried: Set[str]) -> Any:
+        first = asyncio.create_task(self._attempt(profile, request, handler))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+            logger.info(f"Model call on {self._name(profile)} past p95 ({delay:.2f}s); hedging on {self._name(hedge)}")
+            tried.add(self._name(hedge))
+            second = asyncio.create_task(self._attempt(hedge, request, handler))
+            pending = {first, second}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.health.record_hedge(self._name(hedge), won=task is second)
+                        return task.result()
+                    error = task.exception()
+            self.health.record_hedge(self._name(hedge), won=False)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[Any]],
+    ) -> Any:
+        candidates = self._candidates()
+        progress = stream_progress.get()
+        tried: Set[str] = set()
+        last_error: Optional[BaseException] = None
+        for i, profile in enumerate(candidates):
+            name = self._name(profile)
+            if name in tried:
+                continue
+            tried.add(name)
+            hedge = next((p for p in candidates[i + 1:] if self._name(p) not in tried), None)
+            delay = self.health.p95(name) if self.hedge_enabled and hedge is not None and progress is None else None
+            streamed = progress.tokens if progress is not None else 0
+            try:
+                if delay is not None:
+                    return await self._hedged(profile, hedge, delay, request, handler, tried)
+                return await self._attempt(profile, request, handler)
+            except Exception as e:
+                last_error = e
+                reason = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e) or type(e).__name__
+                if not is_transient(e):
+                    raise
+                if progress is not None and progress.tokens > streamed:
+                    logger.warning(f"Model call on profile {name} failed ({reason}) after streaming; not failing over")
+                    raise
+                if len(tried) < len(candidates):
+                    logger.warning(f"Model call on profile {name} failed ({reason}); failing over")
+        raise last_error
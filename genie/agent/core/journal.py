@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, IO, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".jsonl"
+MAX_OPEN_FILES = 128
+
+
+def message_record(msg: BaseMessage) -> Dict[str, str]:
+    """Journal form of a message: the same role/content pair save_memory writes"""
+    content = msg.content
+    if isinstance(content, list):
+        content = " ".join(item.get("text", "") for item in content if isinstance(item, dict))
+    return {"role": "user" if isinstance(msg, HumanMessage) else "assistant", "content": str(content)}
+
+
+def record_message(record: Dict[str, Any]) -> BaseMessage:
+    if record.get("role") == "user":
+        return HumanMessage(content=record.get("content", ""))
+    return AIMessage(content=record.get("content", ""))
+
+
+def is_journal_file(file_path: str) -> bool:
+    """True when file_path holds journal records (one JSON object per line) rather than a JSON document"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        first = f.readline().strip()
+    if not first:
+        # A snapshot of a journal with no turns yet
+        return os.path.getsize(file_path) == 0
+    try:
+        record = json.loads(first)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(record, dict) and "type" in record
+
+
+class ConversationJournal:
+    """
+    Append-only JSONL journal, one file per session.
+    Every completed turn is appended as one record by a background writer thread, so
+    the event loop never serializes or writes conversation files; the files are fsynced
+    every fsync_interval seconds. Replaying a journal (memory_loader.load_tail) restores the
+    session after a crash, and a snapshot is a plain copy of the file.
+    """
+
+    def __init__(self, directory: str, fsync_interval: float = 1.0):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync_interval = fsync_interval
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._files: Dict[str, IO[str]] = {}
+        self._dirty: set = set()
+        self._thread = threading.Thread(target=self._run, name="genie-journal", daemon=True)
+        self._thread.start()
+        logger.info(f"Conversation journal at {self.directory}")
+
+    def path(self, session_id: str) -> Path:
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", session_id) or "default"
+        return self.directory / f"{safe}{JOURNAL_SUFFIX}"
+
+    def append_turn(self, session_id: str, messages: List[BaseMessage]) -> None:
+        self._put(session_id, "turn", messages)
+
+    def reset(self, session_id: str, messages: Optional[List[BaseMessage]] = None) -> None:
+        """Record that the session was cleared or replaced (e.g. by load_memory)"""
+        self._put(session_id, "reset", messages or [])
+
+    def _put(self, session_id: str, kind: str, messages: List[BaseMessage]) -> None:
+        record = {"ts": datetime.now().isoformat(), "type": kind, "messages": [message_record(m) for m in messages]}
+        self._queue.put(("write", session_id, record))
+
+    def load(self, session_id: str, max_tokens: int) -> List[BaseMessage]:
+        """Replay the session's journal, keeping the newest turns within max_tokens.
+        Waits for the writer thread, so callers on the event loop run it in a worker thread."""
+        from .memory_loader import load_tail  # memory_loader reads journal records through this module
+        path = self.path(session_id)
+        if not path.exists():
+            return []
+        self.flush()
+        return load_tail(str(path), max_tokens)
+
+    def version(self, session_id: str) -> None:
+        # Journal files belong to one process; there is nothing to re-sync
+        return None
+
+    def flush(self, timeout: Optional[float] = 10.0) -> None:
+        """Block until everything queued so far is written and fsynced (never call this on the event loop)"""
+        done = threading.Event()
+        self._queue.put(("barrier", None, done))
+        done.wait(timeout)
+
+    def snapshot(self, session_id: str, file_path: str) -> str:
+        """Copy the session's journal to file_path (blocks like load)"""
+        self.flush()
+        source = self.path(session_id)
+        if not source.exists():
+            source.touch()
+        shutil.copyfile(source, file_path)
+        return str(file_path)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+
+    def _run(self) -> None:
+        last_sync = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                item = ()
+            try:
+                if item is None:
+                    self._sync()
+                    for f in self._files.values():
+                        f.close()
+                    self._files.clear()
+                    return
+                if item and item[0] == "write":
+                    _, session_id, record = item
+                    self._file(session_id).write(json.dumps(record, ensure_ascii=False) + "\n")
+                    self._dirty.add(session_id)
+                elif item and item[0] == "barrier":
+                    self._sync()
+                    last_sync = time.monotonic()
+                    item[2].set()
+                if self._dirty and time.monotonic() - last_sync >= self.fsync_interval:
+                    self._sync()
+                    last_sync = time.monotonic()
+            except Exception as e:
+                logger.error(f"Conversation journal write failed: {e}")
+                if item and item[0] == "barrier":
+                    item[2].set()
+
+    def _file(self, session_id: str) -> IO[str]:
+        f = self._files.get(session_id)
+        if f is None:
+            if len(self._files) >= MAX_OPEN_FILES:
+                # Close the least recently opened journal; it is reopened on the session's next turn
+                oldest = next(iter(self._files))
+                self._sync()
+                self._files.pop(oldest).close()
+            f = open(self.path(session_id), "a", encoding="utf-8")
+            self._files[session_id] = f
+        return f
+
+    def _sync(self) -> None:
+        for session_id in list(self._dirty):
+            f = self._files.get(session_id)
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+        self._dirty.clear()
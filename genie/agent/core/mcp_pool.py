@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Any, List
+
+import anyio
+import httpx
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+logger = logging.getLogger(__name__)
+
+MAX_RECONNECT_BACKOFF = 30.0
+
+
+def _root_error(e: BaseException) -> str:
+    """Readable message for transport errors, which anyio wraps in (nested) exception groups"""
+    while isinstance(e, BaseExceptionGroup) and e.exceptions:
+        e = e.exceptions[0]
+    return str(e) or type(e).__name__
+
+
+# Failures that show the request never left: the connection could not be opened, or the
+# session's write stream was already closed/broken when the message was handed to it.
+# Timeouts, read errors and a stream ending while waiting for the reply (EndOfStream,
+# httpx.ReadError, RemoteProtocolError, other OSErrors) may follow a request the server
+# already received, so they are never retried.
+RETRYABLE_ERRORS = (httpx.ConnectError, ConnectionRefusedError, anyio.ClosedResourceError,
+                    anyio.BrokenResourceError)
+NON_RETRYABLE_ERRORS = (httpx.TimeoutException, TimeoutError)
+
+
+def _is_transport_error(e: BaseException) -> bool:
+    """The session itself is broken and needs reopening (whether or not the call may be retried)"""
+    while isinstance(e, BaseExceptionGroup) and e.exceptions:
+        e = e.exceptions[0]
+    return isinstance(e, (anyio.EndOfStream, httpx.TransportError, OSError)) and not isinstance(e, TimeoutError)
+
+
+def _is_retryable(e: BaseException) -> bool:
+    while isinstance(e, BaseExceptionGroup) and e.exceptions:
+        e = e.exceptions[0]
+    return isinstance(e, RETRYABLE_ERRORS) and not isinstance(e, NON_RETRYABLE_ERRORS)
+
+
+class PooledMCPServer:
+    """
+    One long-lived MCP session for a configured server.
+    The session is opened and closed by a dedicated owner task (the transports use
+    anyio cancel scopes, which must be exited by the task that entered them); that
+    task reopens the session with backoff whenever it fails or a reconnect is requested.
+    """
+
+    def __init__(self, client: MultiServerMCPClient, name: str, connect_timeout: float):
+        self.client = client
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.session: Optional[Any] = None
+        self._ready = asyncio.Event()
+        self._reconnect = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        # stats
+        self.calls = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.avg_latency_ms: Optional[float] = None
+        self.last_latency_ms: Optional[float] = None
+        self.last_ping_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.session is not None
+
+    def launch(self) -> None:
+        """Start the owner task; the session opens (and reopens) in the background"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name=f"mcp-session-{self.name}")
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while not self._stopping:
+            try:
+                async with self.client.session(self.name) as session:
+                    self.session = session
+                    self._ready.set()
+                    backoff = 1.0
+                    logger.info(f"MCP session open: {self.name}")
+                    await self._reconnect.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = _root_error(e)
+                logger.warning(f"MCP session for {self.name} failed: {self.last_error}")
+            finally:
+                self.session = None
+                self._ready.clear()
+                self._reconnect.clear()
+            if not self._stopping:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_RECONNECT_BACKOFF)
+                self.reconnects += 1
+                logger.info(f"Reconnecting MCP session: {self.name} (attempt {self.reconnects})")
+
+    async def acquire(self) -> Any:
+        """Current session, waiting for a (re)connect if necessary"""
+        if self.session is None:
+            await asyncio.wait_for(self._ready.wait(), timeout=self.connect_timeout)
+        return self.session
+
+    def request_reconnect(self) -> None:
+        # Callers block in acquire() until the owner task has reopened the session
+        self.session = None
+        self._ready.clear()
+        self._reconnect.set()
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any], **kwargs: Any) -> Any:
+        """
+        Call a tool on the pooled session. If the request provably never reached the server
+        (connect failure, session stream already closed) reconnect and retry once. Any other
+        error is raised as it is, reconnecting first when the transport broke, so a tool is
+        never run twice.
+        """
+        for attempt in (1, 2):
+            session = await self.acquire()
+            start = time.perf_counter()
+            try:
+                result = await session.call_tool(name, arguments, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.last_error = _root_error(e)
+                logger.warning(f"MCP call {self.name}.{name} failed (attempt {attempt}): {self.last_error}")
+                if _is_retryable(e):
+                    self.request_reconnect()
+                    if attempt == 1:
+                        continue
+                elif _is_transport_error(e):
+                    self.request_reconnect()
+                raise
+            self._record_latency((time.perf_counter() - start) * 1000)
+            return result
+
+    async def list_tools(self, **kwargs: Any) -> Any:
+        session = await self.acquire()
+        return await session.list_tools(**kwargs)
+
+    async def ping(self, timeout: float) -> None:
+        session = self.session
+        if session is None:
+            return
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(session.send_ping(), timeout=timeout)
+            self.last_ping_ms = round((time.perf_counter() - start) * 1000, 2)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.last_error = f"health check failed: {e}"
+            logger.warning(f"MCP health check failed for {self.name}: {e}")
+            self.request_reconnect()
+
+    def _record_latency(self, latency_ms: float) -> None:
+        self.calls += 1
+        self.last_latency_ms = round(latency_ms, 2)
+        # Exponential moving average so the figure tracks recent behaviour
+        if self.avg_latency_ms is None:
+            self.avg_latency_ms = self.last_latency_ms
+        else:
+            self.avg_latency_ms = round(0.8 * self.avg_latency_ms + 0.2 * latency_ms, 2)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._reconnect.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+            except Exception as e:
+                logger.warning(f"Error closing MCP session {self.name}: {e}")
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "calls": self.calls,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "avg_latency_ms": self.avg_latency_ms,
+            "last_latency_ms": self.last_latency_ms,
+            "last_ping_ms": self.last_ping_ms,
+            "last_error": self.last_error,
+        }
+
+
+class _PooledSessionProxy:
+    """Stands in for a ClientSession in the adapter's tools so every call goes through the pool"""
+
+    def __init__(self, server: PooledMCPServer):
+        self._server = server
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any], **kwargs: Any) -> Any:
+        return await self._server.call_tool(name, arguments, **kwargs)
+
+    async def list_tools(self, **kwargs: Any) -> Any:
+        return await self._server.list_tools(**kwargs)
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._server.session, item)
+
+
+class MCPSessionPool:
+    """
+    Managed, long-lived MCP sessions for every server in the `mcp` config, with
+    background health checks (ping) and per-server latency/error statistics.
+    Tools loaded through the pool reuse the open session instead of connecting per call.
+    """
+
+    def __init__(self, client: MultiServerMCPClient, health_check_interval: float = 30.0,
+                 connect_timeout: float = 10.0):
+        self.client = client
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self.servers: Dict[str, PooledMCPServer] = {
+            name: PooledMCPServer(client, name, connect_timeout) for name in (client.connections or {})
+        }
+        self._health_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the owner task of every server (connections open in the background) and the health checks"""
+        for server in self.servers.values():
+            server.launch()
+        if self.health_check_interval and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop(), name="mcp-health-check")
+
+    async def load_tools(self, server_name: str) -> List[Any]:
+        """LangChain tools of one server, bound to its pooled session (waits for the session to open)"""
+        server = self.servers[server_name]
+        server.launch()
+        try:
+            await server.acquire()
+            return await load_mcp_tools(_PooledSessionProxy(server))
+        except Exception as e:
+            server.last_error = _root_error(e)
+            raise
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await asyncio.gather(*(s.ping(self.connect_timeout) for s in self.servers.values()),
+                                 return_exceptions=True)
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        await asyncio.gather(*(server.stop() for server in self.servers.values()), return_exceptions=True)
+        logger.info("MCP session pool closed")
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: server.status() for name, server in self.servers.items()}
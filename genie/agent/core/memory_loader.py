@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import re
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from .journal import is_journal_file, record_message
+from .token_counter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+CHUNK_SIZE = 1 << 16
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+# (byte offset, byte length, estimated tokens, is_user) of one message in a saved JSON conversation
+IndexEntry = Tuple[int, int, int, bool]
+
+
+def load_tail(file_path: str, max_tokens: int,
+              count_tokens: Callable[[str], int] = estimate_tokens) -> List[BaseMessage]:
+    """
+    Newest messages of a saved conversation (JSON document or journal) that fit in max_tokens,
+    starting at a user message. Files are read incrementally and older messages are never
+    materialized; JSON documents get an offset index next to them so later loads seek straight to the tail.
+    """
+    if is_journal_file(file_path):
+        records = _tail_journal(file_path, max_tokens, count_tokens)
+    else:
+        records = _tail_json(file_path, max_tokens)
+    return [record_message(r) for r in records]
+
+
+def select_tail(sizes: List[Tuple[int, bool]], max_tokens: int) -> int:
+    """Index of the first message to keep: newest first while the budget allows, at least the newest turn"""
+    total = 0
+    start = len(sizes)
+    for i in range(len(sizes) - 1, -1, -1):
+        tokens = sizes[i][0]
+        if total + tokens > max_tokens and len(sizes) - i > 2:
+            break
+        total += tokens
+        start = i
+    # Begin on a user message so the history never opens with an orphaned answer
+    while start < len(sizes) - 1 and not sizes[start][1]:
+        start += 1
+    return start
+
+
+# ---- journal (JSONL) -------------------------------------------------------
+
+def _reverse_lines(file_path: str) -> Iterator[bytes]:
+    """Lines of a file from last to first, read backwards in blocks"""
+    with open(file_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            size = min(CHUNK_SIZE, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size) + remainder
+            lines = block.split(b"\n")
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
+
+def _tail_journal(file_path: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[Dict[str, Any]]:
+    newest_first: List[Tuple[Dict[str, Any], int]] = []
+    total = 0
+    for line in _reverse_lines(file_path):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning("Skipping unreadable journal record")
+            continue
+        for message in reversed(record.get("messages", [])):
+            tokens = count_tokens(message.get("content", ""))
+            newest_first.append((message, tokens))
+            total += tokens
+        # Everything before a reset record was discarded; stop once the budget is spent
+        if record.get("type") == "reset" or total > max_tokens:
+            break
+    newest_first.reverse()
+    start = select_tail([(tokens, message.get("role") == "user") for message, tokens in newest_first], max_tokens)
+    return [message for message, _ in newest_first[start:]]
+
+
+# ---- JSON document (save_memory format) with an offset index ---------------
+
+def index_path(file_path: str) -> str:
+    return file_path + INDEX_SUFFIX
+
+
+def _read_index(file_path: str) -> Optional[List[IndexEntry]]:
+    try:
+        with open(index_path(file_path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        stat = os.stat(file_path)
+        if (index.get("version") != INDEX_VERSION or index.get("size") != stat.st_size
+                or index.get("mtime_ns") != stat.st_mtime_ns):
+            return None
+        return [tuple(entry) for entry in index["entries"]]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_index(file_path: str, entries: List[IndexEntry]) -> None:
+    stat = os.stat(file_path)
+    index = {"version": INDEX_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "entries": entries}
+    try:
+        with open(index_path(file_path), "w", encoding="utf-8") as f:
+            f.write(json.dumps(index, separators=(",", ":")))
+    except OSError as e:
+        logger.warning(f"Could not write memory index for {file_path}: {e}")
+
+
+def _tail_json(file_path: str, max_tokens: int) -> List[Dict[str, Any]]:
+    entries = _read_index(file_path)
+    if entries is not None:
+        start = select_tail([(e[2], e[3]) for e in entries], max_tokens)
+        records = []
+        with open(file_path, "rb") as f:
+            for offset, length, _, _ in entries[start:]:
+                f.seek(offset)
+                records.append(json.loads(f.read(length)))
+        return records
+
+    # No usable index: one streaming pass that keeps a sliding window of the newest messages
+    entries = []
+    window: Deque[Tuple[Dict[str, Any], int]] = deque()
+    window_tokens = 0
+    for offset, length, record in _iter_json_messages(file_path):
+        tokens = estimate_tokens(record.get("content", ""))
+        entries.append((offset, length, tokens, record.get("role") == "user"))
+        window.append((record, tokens))
+        window_tokens += tokens
+        while len(window) > 2 and window_tokens - window[0][1] >= max_tokens:
+            window_tokens -= window.popleft()[1]
+    _write_index(file_path, entries)
+    records = [record for record, _ in window]
+    start = select_tail([(tokens, record.get("role") == "user") for record, tokens in window], max_tokens)
+    return records[start:]
+
+
+class _TextStream:
+    """Incrementally read text with the byte offset of the buffer start tracked for the index"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        # Byte offset of buf[mark]; advanced incrementally so offsets cost O(bytes consumed)
+        self.mark = 0
+        self.mark_bytes = 0
+
+    def more(self, size: int = CHUNK_SIZE) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+            return False
+        # Drop what has been consumed, keeping byte offsets exact
+        self.mark_bytes = self.byte_offset()
+        self.mark = 0
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def byte_offset(self) -> int:
+        self.mark_bytes += len(self.buf[self.mark:self.pos].encode("utf-8"))
+        self.mark = self.pos
+        return self.mark_bytes
+
+    def skip_ws(self) -> str:
+        """Advance past whitespace and return the next character ('' at end of file)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.skip_ws() != char:
+            raise ValueError(f"Expected {char!r} at byte {self.byte_offset()}")
+        self.pos += 1
+
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        """Decode the next JSON value, reading further (in growing steps) while it is incomplete"""
+        self.skip_ws()
+        size = CHUNK_SIZE
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+                # A number at the buffer edge may continue in the next chunk
+                if end < len(self.buf) or self.eof or isinstance(value, (dict, list, str)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.more(size)
+            size *= 2
+
+
+def _iter_json_messages(file_path: str) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """(byte offset, byte length, message) of each entry of the top-level "messages" array"""
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8") as f:
+        stream = _TextStream(f)
+        stream.expect("{")
+        while True:
+            if stream.skip_ws() == "}":
+                return
+            key = stream.decode(decoder)
+            stream.expect(":")
+            if key == "messages":
+                break
+            stream.decode(decoder)
+            if stream.skip_ws() == ",":
+                stream.pos += 1
+        stream.expect("[")
+        while True:
+            char = stream.skip_ws()
+            if char in ("]", ""):
+                return
+            if char == ",":
+                stream.pos += 1
+                continue
+            start = stream.byte_offset()
+            record = stream.decode(decoder)
+            yield start, stream.byte_offset() - start, record
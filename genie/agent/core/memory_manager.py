@@ -1,4 +1,8 @@
+import asyncio
 import logging
+from bisect import bisect_left
+from contextlib import nullcontext
+from itertools import accumulate
 from typing import Optional
 # from langchain.memory import ConversationBufferMemory
 from langchain_core.chat_history import BaseChatMessageHistory
@@ -7,11 +11,100 @@ from genie.agent.config.agent_config import AgentConfig
 from typing import Optional
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.language_models import BaseChatModel
+from typing import Callable, List
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from langchain_community.chat_message_histories import ChatMessageHistory
+from pydantic import PrivateAttr
 from genie.agent.config.agent_config import AgentConfig
+from .token_counter import TokenCounter, estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+# The compacted summary is stored as a user/assistant pair so every provider accepts the
+# history (Bedrock/Anthropic reject system messages after the first one).
+SUMMARY_REQUEST = "[Genie] Summarize our earlier conversation."
+SUMMARY_INSTRUCTIONS = (
+    "You compress chat history. Summarize the conversation below so it can replace the original turns. "
+    "Keep facts, decisions, names, identifiers, code and open questions; drop pleasantries. "
+    "Write a concise summary in plain prose."
+)
+
+
+class TokenCountedChatMessageHistory(ChatMessageHistory):
+    """
+    ChatMessageHistory that caches a token count per message and keeps a running total,
+    updated on add, drop and clear, so reading the total costs the same at any history length.
+    """
+
+    _token_counter: Optional[Callable[[BaseMessage], int]] = PrivateAttr(default=None)
+    _token_counts: List[int] = PrivateAttr(default_factory=list)
+    _total: int = PrivateAttr(default=0)
+
+    def set_token_counter(self, counter: Callable[[BaseMessage], int]) -> None:
+        """Install the per-message counter and recount the current history with it"""
+        self._token_counter = counter
+        self.recount()
+
+    def add_message(self, message: BaseMessage) -> None:
+        self._sync()
+        tokens = self._count(message)
+        self.messages.append(message)
+        self._token_counts.append(tokens)
+        self._total += tokens
+
+    def clear(self) -> None:
+        self.messages = []
+        self._token_counts = []
+        self._total = 0
+
+    def extend_counted(self, messages: List[BaseMessage], token_counts: List[int]) -> None:
+        """Append messages whose token counts are already known (e.g. restored from a snapshot)"""
+        self._sync()
+        self.messages.extend(messages)
+        self._token_counts.extend(token_counts)
+        self._total += sum(token_counts)
+
+    def drop_oldest(self, count: int) -> List[BaseMessage]:
+        """Remove the oldest `count` messages in a single slice operation"""
+        self._sync()
+        removed = self.messages[:count]
+        self._total -= sum(self._token_counts[:count])
+        del self.messages[:count]
+        del self._token_counts[:count]
+        return removed
+
+    def replace_oldest(self, count: int, replacement: List[BaseMessage]) -> None:
+        """Swap the oldest `count` messages for `replacement` (used by compaction)"""
+        self._sync()
+        counts = [self._count(msg) for msg in replacement]
+        self._total += sum(counts) - sum(self._token_counts[:count])
+        self.messages[:count] = replacement
+        self._token_counts[:count] = counts
+
+    @property
+    def total_tokens(self) -> int:
+        self._sync()
+        return self._total
+
+    @property
+    def token_counts(self) -> List[int]:
+        """Cached token count of each message, aligned with self.messages"""
+        self._sync()
+        return self._token_counts
+
+    def recount(self) -> None:
+        self._token_counts = [self._count(msg) for msg in self.messages]
+        self._total = sum(self._token_counts)
+
+    def _count(self, message: BaseMessage) -> int:
+        return self._token_counter(message) if self._token_counter else 0
+
+    def _sync(self) -> None:
+        # Guard against callers that mutate `messages` directly instead of going through this class
+        if len(self._token_counts) != len(self.messages):
+            logger.debug("Token cache out of sync with history, recounting")
+            self.recount()
+
 class MemoryManager:
     """
     Memory manager for Genie: wraps a ChatMessageHistory instead of ConversationBufferMemory
@@ -21,54 +114,186 @@ class MemoryManager:
     def __init__(self, config: AgentConfig, llm: Optional[BaseChatModel] = None):
         self.config = config
         self.llm = llm  # LLM instance for accurate token counting
-        self.chat_memory = ChatMessageHistory()
+        self.token_counter = TokenCounter(llm)
+        self.chat_memory = TokenCountedChatMessageHistory()
+        self.chat_memory.set_token_counter(self._message_tokens)
         self.memory = self
+        # Token total that triggers the next compaction; raised when a compaction could not
+        # get the history below the trigger, so every later turn does not summarize again
+        self._next_compaction_at: Optional[int] = None
     
     def _estimate_tokens(self, text: str) -> int:
         """
         Estimate token count without external downloads.
         Uses word/character-based heuristics that work well across all providers.
         """
-        if not text:
-            return 0
-            
-        # Fallback to word-based calculation
-        words = len(text.split())
-        chars = len(text)
-        estimated = int(words * 1.3 + chars * 0.01)
-        return max(1, estimated)
-    
+        return estimate_tokens(text)
+
+    def count_tokens(self, text: str) -> int:
+        """Token count of text as a user message: the model's cached count, else the heuristic"""
+        return self.token_counter.count_text(text)
+
+    def _message_tokens(self, msg: BaseMessage) -> int:
+        return self.token_counter.count_message(msg)
+
+    async def refine_token_counts(self) -> None:
+        """Replace heuristic counts with the provider's counts, counted off the event loop"""
+        if await self.token_counter.refine(list(self.chat_memory.messages)):
+            # Every message is now a cache hit (or still the heuristic), so this is cheap
+            self.chat_memory.recount()
+
     def _total_tokens(self) -> int:
-        # CHANGED: Previously iterated over self.memory.chat_memory.messages (ConversationBufferMemory);
-        # now we read directly from self.chat_memory.messages because we removed the wrapper.
-        total = 0
-        for msg in self.chat_memory.messages:
-            content = getattr(msg, "content", "")
-            total += self._estimate_tokens(str(content))
-        return total
+        # CHANGED: Previously re-estimated every message on each call; the history now
+        # keeps a running total that is updated on add, drop and clear.
+        return self.chat_memory.total_tokens
     
-    def trim_if_needed(self) -> None:
+    def trim_if_needed(self, reserve_tokens: int = 0) -> int:
+        """
+        Drop the oldest whole user/AI turns so the history (plus reserve_tokens for an
+        incoming message) fits in max_tokens_in_memory. The cut point is found with a
+        binary search over cumulative token offsets and removed in one slice.
+        Returns the number of messages removed.
+        """
+        cut = self._trim_cut_index(self.config.max_tokens_in_memory - reserve_tokens)
+        if cut <= 0:
+            return 0
+        removed = self.chat_memory.drop_oldest(cut)
+        logger.info(f"Trimmed {len(removed)} messages (token limit), total tokens now: {self._total_tokens()}")
+        return len(removed)
+
+    def _trim_cut_index(self, budget: int) -> int:
+        messages = self.chat_memory.messages
+        excess = self._total_tokens() - budget
+        if excess <= 0:
+            return 0
+        # Keep at least the last turn, so the cut can go no further than its user message
+        last_start = next((i for i in range(len(messages) - 1, 0, -1) if isinstance(messages[i], HumanMessage)), 0)
+        if last_start <= 0:
+            return 0
+        offsets = list(accumulate(self.chat_memory.token_counts[:last_start]))
+        cut = min(bisect_left(offsets, excess) + 1, last_start)
+        # Move forward to the next user message: the history must start a turn, never with an AI reply
+        while not isinstance(messages[cut], HumanMessage):
+            cut += 1
+        return cut
+
+    def fits(self, incoming_tokens: int = 0) -> bool:
+        return self._total_tokens() + incoming_tokens <= self.config.max_tokens_in_memory
+
+    def _compaction_trigger(self) -> int:
+        return int(self.config.max_tokens_in_memory * self.config.compaction_trigger_ratio)
+
+    def needs_compaction(self) -> bool:
+        if not self.config.compaction_enabled or self.llm is None:
+            return False
+        threshold = self._next_compaction_at if self._next_compaction_at is not None else self._compaction_trigger()
+        return self._total_tokens() >= threshold
+
+    def _compaction_cut_index(self) -> int:
+        """
+        Index of the first message kept verbatim: the start of the last `compaction_keep_turns`
+        turns, moved to later turns (keeping at least one) while the kept tail is above
+        compaction_target_ratio of the budget.
+        """
         messages = self.chat_memory.messages
-        # Token-based trimming loop; keep at least one user+AI turn 
-        while self._total_tokens() > self.config.max_tokens_in_memory and len(messages) > 2:
-            removed = messages.pop(0)
-            logger.info(f"Trimmed message (token limit), removed ~{self._estimate_tokens(getattr(removed, 'content', ''))} tokens")
+        keep = max(1, self.config.compaction_keep_turns)
+        starts = [i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage) and msg.content != SUMMARY_REQUEST]
+        if len(starts) <= keep:
+            return 0
+        target = self.config.max_tokens_in_memory * self.config.compaction_target_ratio
+        counts = self.chat_memory.token_counts
+        tail_tokens = {start: sum(counts[start:]) for start in starts[-keep:]}
+        candidates = starts[-keep:]
+        while len(candidates) > 1 and tail_tokens[candidates[0]] > target:
+            candidates.pop(0)
+        return candidates[0]
+
+    async def compact(self, lock: Optional[asyncio.Lock] = None) -> bool:
+        """
+        Summarize the oldest turns into one summary exchange with the active LLM and keep
+        the most recent turns verbatim. The model call runs without touching the history;
+        the result is applied under `lock` (the session lock), and only if the summarized
+        prefix is still unchanged.
+        """
+        llm = self.llm
+        cut = self._compaction_cut_index()
+        prefix = list(self.chat_memory.messages[:cut])
+        # Nothing to do unless there is at least one real turn older than the kept ones
+        if llm is None or not any(isinstance(msg, HumanMessage) and msg.content != SUMMARY_REQUEST for msg in prefix):
+            return False
+
+        transcript = "\n\n".join(self._transcript_line(msg) for msg in prefix if msg.content != SUMMARY_REQUEST)
+        before = self._total_tokens()
+        try:
+            response = await llm.ainvoke([SystemMessage(content=SUMMARY_INSTRUCTIONS), HumanMessage(content=transcript)])
+        except Exception as e:
+            logger.warning(f"Conversation compaction failed: {e}")
+            return False
+        summary = self._content_text(getattr(response, "content", response)).strip()
+        if not summary:
+            return False
+
+        async with lock if lock is not None else nullcontext():
+            current = self.chat_memory.messages
+            if len(current) < cut or any(a is not b for a, b in zip(prefix, current[:cut])):
+                logger.info("History changed during compaction, discarding summary")
+                return False
+            self.chat_memory.replace_oldest(cut, [HumanMessage(content=SUMMARY_REQUEST), AIMessage(content=summary)])
+            after = self._total_tokens()
+            trigger = self._compaction_trigger()
+            if after >= trigger:
+                # Still above the trigger: wait until as much new history has arrived as a
+                # compaction from the trigger down to the target would have removed
+                gap = trigger - int(self.config.max_tokens_in_memory * self.config.compaction_target_ratio)
+                self._next_compaction_at = after + max(gap, 1)
+                logger.info(f"Compaction left {after} tokens (trigger {trigger}); next compaction at {self._next_compaction_at}")
+            else:
+                self._next_compaction_at = None
+        logger.info(f"Compacted {cut} messages into a summary, tokens {before} -> {after}")
+        return True
+
+    @staticmethod
+    def _content_text(content) -> str:
+        if isinstance(content, list):
+            return " ".join(item.get("text", "") for item in content if isinstance(item, dict))
+        return str(content)
+
+    def _transcript_line(self, msg: BaseMessage) -> str:
+        role = "User" if isinstance(msg, HumanMessage) else "Assistant"
+        return f"{role}: {self._content_text(msg.content)}"
 
     def check_memory_status(self) -> None:
-        if self._total_tokens() > self.config.max_tokens_in_memory:
-            logger.info(f"Memory is full, total tokens: {self._total_tokens()}")
+        total = self._total_tokens()
+        if total > self.config.max_tokens_in_memory:
+            logger.info(f"Memory is full, total tokens: {total}")
         else:
-            logger.info(f"Memory is not full, total tokens: {self._total_tokens()}")
+            logger.info(f"Memory is not full, total tokens: {total}")
 
     def clear(self) -> None:
         # CHANGED: Previously called self.memory.clear() on ConversationBufferMemory;
         # now we clear the underlying ChatMessageHistory directly.
         self.chat_memory.clear()
+        self._next_compaction_at = None
         logger.info("Memory cleared")
     
+    def restore(self, messages: List[BaseMessage], token_counts: List[int], token_model: str) -> None:
+        """Replace the history, reusing saved token counts when they came from the active counter"""
+        self.chat_memory.clear()
+        self._next_compaction_at = None
+        if token_model == self.token_counter.model and len(token_counts) == len(messages):
+            self.chat_memory.extend_counted(messages, token_counts)
+        else:
+            for msg in messages:
+                self.chat_memory.add_message(msg)
+
     def set_llm(self, llm: Optional[BaseChatModel]) -> None:
         """Update the LLM instance for token counting"""
+        if llm is self.llm:
+            return
         self.llm = llm
+        self.token_counter.set_llm(llm)
+        # Counts are model specific: cached provider counts or the heuristic, never a provider call
+        self.chat_memory.recount()
         logger.info(f"LLM instance updated for token counting: {type(llm).__name__ if llm else 'None'}")
 
     # NOTE (migration):
@@ -0,0 +1,92 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.agents.middleware.types import ModelRequest
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+# Chat model classes that accept prompt-cache breakpoints in message content -> provider id.
+# Resolved per call, so a request failed over to another profile is marked for that provider.
+PROMPT_CACHE_MODELS = {
+    "ChatAnthropic": "anthropic",
+    "ChatBedrockConverse": "aws-bedrock",
+}
+
+ANTHROPIC_CACHE_CONTROL = {"type": "ephemeral"}
+BEDROCK_CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+def _text_blocks(content: Any) -> List[Any]:
+    if isinstance(content, list):
+        return list(content)
+    return [{"type": "text", "text": str(content)}] if content else []
+
+
+class PromptCacheMiddleware(AgentMiddleware):
+    """
+    Marks the stable prefix of every model call as cacheable for Anthropic and Bedrock.
+    Both providers order a request as tools -> system -> messages, so a breakpoint after
+    the system prompt caches the tool definitions and the prompt, and a second one on the
+    last message before the current question caches the older history. Only the new
+    question and the current turn's tool round-trips are then billed (and processed) in full.
+    Usage is reported back as input_token_details.cache_read / cache_creation.
+    """
+
+    def _mark(self, content: Any, model: Any, provider_id: str) -> Optional[List[Any]]:
+        """Content with a cache breakpoint at its end (None when it has no cacheable text)"""
+        blocks = _text_blocks(content)
+        if not blocks:
+            return None
+        if provider_id == "aws-bedrock":
+            create = getattr(type(model), "create_cache_point", None)
+            return blocks + [create() if create else dict(BEDROCK_CACHE_POINT)]
+        last = blocks[-1]
+        if not isinstance(last, dict) or last.get("type") != "text":
+            return None
+        blocks[-1] = {**last, "cache_control": dict(ANTHROPIC_CACHE_CONTROL)}
+        return blocks
+
+    def _stable_prefix_end(self, messages: List[BaseMessage]) -> Optional[int]:
+        """Index of the last cacheable message before the current turn's question"""
+        question = next((i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)), None)
+        if question is None:
+            return None
+        for i in range(question - 1, -1, -1):
+            if isinstance(messages[i], (HumanMessage, AIMessage)) and messages[i].content:
+                return i
+        return None
+
+    def _apply(self, request: ModelRequest) -> ModelRequest:
+        provider_id = PROMPT_CACHE_MODELS.get(type(request.model).__name__)
+        if provider_id is None:
+            return request
+        overrides: Dict[str, Any] = {}
+        system_message = getattr(request, "system_message", None)
+        if system_message is not None:
+            content = self._mark(system_message.content, request.model, provider_id)
+            if content is not None:
+                overrides["system_message"] = SystemMessage(content=content)
+
+        messages = list(request.messages)
+        index = self._stable_prefix_end(messages)
+        if index is not None:
+            content = self._mark(messages[index].content, request.model, provider_id)
+            if content is not None:
+                messages[index] = messages[index].model_copy(update={"content": content})
+                overrides["messages"] = messages
+
+        return request.override(**overrides) if overrides else request
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[Any]],
+    ) -> Any:
+        try:
+            request = self._apply(request)
+        except Exception as e:
+            # Caching is an optimization; never fail a turn because of it
+            logger.warning(f"Prompt cache breakpoints not applied: {e}")
+        return await handler(request)
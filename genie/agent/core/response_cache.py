@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str, str]
+
+
+def normalize_question(question: str) -> str:
+    """Case and whitespace insensitive form of a question"""
+    return " ".join(question.split()).lower()
+
+
+def history_fingerprint(messages: Sequence[BaseMessage]) -> str:
+    """Stable hash of a conversation (role + content of every message)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for msg in messages:
+        digest.update(msg.type.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(" ".join(str(msg.content).split()).encode("utf-8"))
+        digest.update(b"\x01")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Answer cache in front of the agent graph, keyed on
+    (profile_name, model_name, history fingerprint, normalized question).
+    Entries expire after ttl_seconds; the least recently used entry is evicted once max_size is reached.
+    """
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(profile_name: str, model_name: str, history: Sequence[BaseMessage], question: str) -> CacheKey:
+        return (profile_name or "", model_name or "", history_fingerprint(history), normalize_question(question))
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, answer = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return answer
+
+    def put(self, key: CacheKey, answer: str) -> None:
+        if self.max_size <= 0 or not answer:
+            return
+        self._data[key] = (time.monotonic() + self.ttl_seconds, answer)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        logger.info("Response cache cleared")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional, List
+
+from genie.agent.config.agent_config import AgentConfig
+from .memory_manager import MemoryManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_ID = "default"
+
+
+class Session:
+    """One conversation: its own history plus a lock that keeps its turns ordered."""
+
+    def __init__(self, session_id: str, config: AgentConfig):
+        self.session_id = session_id
+        self.memory_mgr = MemoryManager(config)
+        self.lock = asyncio.Lock()
+        self.compaction_task: Optional[asyncio.Task] = None
+        # Reloaded from the conversation store on first use; callers wait for the same restore
+        self.needs_restore = False
+        self.restore_task: Optional[asyncio.Future] = None
+        self.token_task: Optional[asyncio.Task] = None
+        # Conversation store version this history reflects (None: unknown, reload before the next turn)
+        self.store_version: Optional[int] = None
+        # Ephemeral sessions (isolated batch questions) are never written to the conversation store
+        self.ephemeral = False
+
+
+class SessionStore:
+    """
+    Session-keyed conversation store for the Genie agent.
+    Every session owns a MemoryManager and an asyncio.Lock, so different sessions
+    can run the agent in parallel while turns inside one session stay ordered.
+    Least recently used idle sessions are evicted once max_sessions is exceeded;
+    ephemeral sessions (isolated batch questions) neither count nor are evicted, since
+    their owner deletes them. `persistent` says whether a conversation store can restore
+    an evicted session; without one its history is lost, which is logged as a warning.
+    """
+
+    def __init__(self, config: AgentConfig, persistent: bool = False):
+        self.config = config
+        self.persistent = persistent
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # The default session is never evicted; it backs callers that send no session id
+        self._sessions[DEFAULT_SESSION_ID] = Session(DEFAULT_SESSION_ID, config)
+
+    @staticmethod
+    def normalize_id(session_id: Optional[str]) -> str:
+        session_id = (session_id or "").strip()
+        return session_id or DEFAULT_SESSION_ID
+
+    def get(self, session_id: Optional[str] = None, ephemeral: bool = False) -> Session:
+        """Return the session for session_id, creating it (ephemeral if asked) on first use"""
+        session_id = self.normalize_id(session_id)
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(session_id, self.config)
+            session.ephemeral = ephemeral
+            self._sessions[session_id] = session
+            logger.info(f"Created session: {session_id} (active sessions: {len(self._sessions)})")
+            self._evict_if_needed()
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def exists(self, session_id: Optional[str]) -> bool:
+        return self.normalize_id(session_id) in self._sessions
+
+    def delete(self, session_id: Optional[str]) -> bool:
+        """Drop a session; the default session is only cleared"""
+        session_id = self.normalize_id(session_id)
+        if session_id == DEFAULT_SESSION_ID:
+            self._sessions[DEFAULT_SESSION_ID].memory_mgr.clear()
+            return True
+        removed = self._sessions.pop(session_id, None)
+        if removed is not None:
+            logger.info(f"Deleted session: {session_id}")
+        return removed is not None
+
+    def session_ids(self) -> List[str]:
+        return list(self._sessions.keys())
+
+    def values(self) -> List[Session]:
+        return list(self._sessions.values())
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_if_needed(self) -> None:
+        max_sessions = self.config.max_sessions
+        if not max_sessions:
+            return
+        retained = [session_id for session_id, session in self._sessions.items() if not session.ephemeral]
+        excess = len(retained) - max_sessions
+        # Oldest first; skip the default session and any session with a turn in flight
+        for session_id in retained:
+            if excess <= 0:
+                break
+            session = self._sessions[session_id]
+            if session_id == DEFAULT_SESSION_ID or session.lock.locked():
+                continue
+            del self._sessions[session_id]
+            excess -= 1
+            if self.persistent:
+                logger.info(f"Evicted idle session: {session_id} (restored from the conversation store on next use)")
+            else:
+                logger.warning(f"Evicted idle session: {session_id}; its history is lost (no conversation store configured)")
@@ -0,0 +1,90 @@
+import json
+import os
+import struct
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from .journal import message_record
+
+MAGIC = b"GENIESNP"
+SCHEMA_VERSION = 1
+SNAPSHOT_SUFFIX = ".gsnap"
+
+_PREAMBLE = struct.Struct(">8sH")  # magic, schema version
+_LENGTH = struct.Struct(">I")
+_MESSAGE = struct.Struct(">cI")  # role (b"u"/b"a"), cached token count
+
+
+def is_snapshot_file(file_path: str) -> bool:
+    with open(file_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _records(header: Dict[str, Any], messages: List[BaseMessage], token_counts: List[int]) -> Iterator[bytes]:
+    yield json.dumps(header, ensure_ascii=False).encode("utf-8")
+    for msg, tokens in zip(messages, token_counts):
+        record = message_record(msg)
+        role = b"u" if record["role"] == "user" else b"a"
+        yield _MESSAGE.pack(role, tokens) + record["content"].encode("utf-8")
+
+
+def write_snapshot(file_path: str, messages: List[BaseMessage], token_counts: List[int],
+                   meta: Dict[str, Any]) -> int:
+    """
+    Write a session snapshot: a fixed preamble (magic + schema version) followed by a zlib
+    stream of length-prefixed records. The first record is a JSON header (model/profile,
+    token model, counts); every further record is one message with its cached token count.
+    Written to a temporary file and renamed, so a crash never leaves a torn snapshot.
+    Returns the file size in bytes.
+    """
+    header = {
+        "schema_version": SCHEMA_VERSION,
+        "created": datetime.now().isoformat(),
+        "total_messages": len(messages),
+        "total_tokens": sum(token_counts),
+        **meta,
+    }
+    tmp_path = f"{file_path}.tmp"
+    compressor = zlib.compressobj(6)
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, SCHEMA_VERSION))
+        for record in _records(header, messages, token_counts):
+            f.write(compressor.compress(_LENGTH.pack(len(record)) + record))
+        f.write(compressor.flush())
+    os.replace(tmp_path, file_path)
+    return os.path.getsize(file_path)
+
+
+def read_snapshot(file_path: str) -> Tuple[Dict[str, Any], List[BaseMessage], List[int]]:
+    """Header, messages and cached per-message token counts of a snapshot"""
+    with open(file_path, "rb") as f:
+        magic, version = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{file_path} is not a Genie snapshot")
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Snapshot schema {version} is newer than supported ({SCHEMA_VERSION})")
+        payload = zlib.decompress(f.read())
+
+    view = memoryview(payload)
+    position = 0
+    records: List[bytes] = []
+    while position < len(view):
+        (length,) = _LENGTH.unpack_from(view, position)
+        position += _LENGTH.size
+        records.append(view[position:position + length])
+        position += length
+    if not records:
+        raise ValueError(f"{file_path} has no snapshot header")
+
+    header = json.loads(bytes(records[0]).decode("utf-8"))
+    messages: List[BaseMessage] = []
+    token_counts: List[int] = []
+    for record in records[1:]:
+        role, tokens = _MESSAGE.unpack_from(record, 0)
+        content = bytes(record[_MESSAGE.size:]).decode("utf-8")
+        messages.append(HumanMessage(content=content) if role == b"u" else AIMessage(content=content))
+        token_counts.append(tokens)
+    return header, messages, token_counts
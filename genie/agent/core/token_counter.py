@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel, BaseLanguageModel
+from langchain_core.messages import BaseMessage, HumanMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 4096
+# Backoff after a failed provider count (network error, rate limit): doubles per failure up to the max
+REFINE_BACKOFF_SECONDS = 5.0
+MAX_REFINE_BACKOFF_SECONDS = 300.0
+
+
+class TokenCountCache:
+    """Bounded, thread-safe LRU of token counts keyed by (model, content hash)"""
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._data: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[int]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple[str, str], value: int) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Shared by every session so repeated prompts and history are tokenized once per model
+_shared_cache = TokenCountCache()
+# model -> (consecutive provider counter failures, monotonic time before which refine() skips it)
+_refine_backoff: Dict[str, Tuple[int, float]] = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate token count without external downloads.
+    Uses word/character-based heuristics that work well across all providers.
+    """
+    if not text:
+        return 0
+
+    # Fallback to word-based calculation
+    words = len(text.split())
+    chars = len(text)
+    estimated = int(words * 1.3 + chars * 0.01)
+    return max(1, estimated)
+
+
+def model_key(llm: Optional[BaseChatModel]) -> str:
+    """Stable identifier of the model whose tokenizer produced a count"""
+    if llm is None:
+        return "heuristic"
+    for attr in ("model_name", "model", "model_id"):
+        value = getattr(llm, attr, None)
+        if isinstance(value, str) and value:
+            return f"{type(llm).__name__}:{value}"
+    return type(llm).__name__
+
+
+def has_native_counter(llm: Optional[BaseChatModel]) -> bool:
+    """True when the provider overrides LangChain's default (GPT-2 download based) counter"""
+    if llm is None:
+        return False
+    method = getattr(type(llm), "get_num_tokens_from_messages", None)
+    return method is not None and method is not BaseLanguageModel.get_num_tokens_from_messages
+
+
+class TokenCounter:
+    """
+    Counts message tokens with the provider's own counter where one exists
+    (get_num_tokens_from_messages) and falls back to the heuristic otherwise.
+    Provider counters may block (Anthropic calls its count_tokens API, tiktoken downloads
+    its encodings), so they only run in a worker thread through refine(); count_message
+    never calls the provider and returns the cached provider count or the heuristic.
+    Results are memoized in an LRU keyed by (model, content hash). A failing provider
+    counter is retried with exponential backoff rather than disabled.
+    """
+
+    def __init__(self, llm: Optional[BaseChatModel] = None, cache: Optional[TokenCountCache] = None):
+        self.cache = cache if cache is not None else _shared_cache
+        self.set_llm(llm)
+
+    def set_llm(self, llm: Optional[BaseChatModel]) -> None:
+        self.llm = llm
+        self.native = has_native_counter(llm)
+        self.model = model_key(llm) if self.native else "heuristic"
+
+    def _key(self, message: BaseMessage) -> Tuple[str, str]:
+        content = str(getattr(message, "content", ""))
+        digest = hashlib.blake2b(f"{message.type}\x00{content}".encode("utf-8"), digest_size=16).hexdigest()
+        return self.model, digest
+
+    def count_message(self, message: BaseMessage) -> int:
+        """Cached provider count, or the heuristic until refine() has counted the message"""
+        if self.native:
+            cached = self.cache.get(self._key(message))
+            if cached is not None:
+                return cached
+        # The heuristic is cheaper than hashing, so it is not cached
+        return estimate_tokens(str(getattr(message, "content", "")))
+
+    async def refine(self, messages: Sequence[BaseMessage]) -> bool:
+        """
+        Count messages the cache has not seen with the provider's counter, in one worker
+        thread so the event loop never waits on it. Returns True when new counts were cached.
+        """
+        if not self.native:
+            return False
+        llm, model = self.llm, self.model
+        failures, retry_at = _refine_backoff.get(model, (0, 0.0))
+        if time.monotonic() < retry_at:
+            return False
+        pending = {}
+        for message in messages:
+            key = self._key(message)
+            if key not in pending and self.cache.get(key) is None:
+                pending[key] = message
+        if not pending:
+            return False
+
+        def count_all() -> List[int]:
+            return [llm.get_num_tokens_from_messages([message]) for message in pending.values()]
+
+        try:
+            counts = await asyncio.to_thread(count_all)
+        except Exception as e:
+            # Often transient; keep the heuristic for now and try the provider again later
+            delay = min(REFINE_BACKOFF_SECONDS * 2 ** failures, MAX_REFINE_BACKOFF_SECONDS)
+            _refine_backoff[model] = (failures + 1, time.monotonic() + delay)
+            logger.warning(f"Provider token counter failed for {model}, using heuristic for {delay:.0f}s: {e}")
+            return False
+        _refine_backoff.pop(model, None)
+        if self.model != model:
+            # The model was switched while counting; these counts belong to the old one
+            return False
+        for key, tokens in zip(pending, counts):
+            self.cache.put(key, tokens)
+        return True
+
+    def count_text(self, text: str) -> int:
+        if not text:
+            return 0
+        return self.count_message(HumanMessage(content=text))
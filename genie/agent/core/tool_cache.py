@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain_core.messages import ToolMessage, message_to_dict, messages_from_dict
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_args(args: Any) -> str:
+    """Canonical JSON of tool arguments (key order and whitespace independent)"""
+    return json.dumps(args, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class _DiskTier:
+    """SQLite-backed second tier so cached tool results survive restarts"""
+
+    def __init__(self, path: str):
+        Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(Path(path).expanduser()), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_results ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM tool_results WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at, value FROM tool_results WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], row[1]
+
+    def put(self, key: str, expires_at: float, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO tool_results VALUES (?, ?, ?)", (key, expires_at, value))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_results")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ToolResultCache:
+    """
+    Memoizes MCP tool results keyed by (server, tool name, canonical JSON of the arguments).
+    Only tools listed in `ttls` are cached (the allow-list), each with its own TTL in seconds
+    (keys are either "tool" or "server.tool"). Entries live in a bounded in-memory LRU and,
+    when `disk_path` is set, in an SQLite file that survives restarts.
+    """
+
+    def __init__(self, ttls: Dict[str, float], max_size: int = 1024, disk_path: Optional[str] = None):
+        self.ttls = dict(ttls)
+        self.max_size = max_size
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._disk: Optional[_DiskTier] = None
+        if disk_path:
+            try:
+                self._disk = _DiskTier(disk_path)
+                logger.info(f"Tool result cache persisted to {disk_path}")
+            except Exception as e:
+                logger.error(f"Tool result cache disk tier disabled: {e}")
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.per_tool: Dict[str, Dict[str, int]] = {}
+
+    def ttl_for(self, server: str, tool: str) -> Optional[float]:
+        return self.ttls.get(f"{server}.{tool}", self.ttls.get(tool))
+
+    @staticmethod
+    def make_key(server: str, tool: str, args: Any) -> str:
+        raw = f"{server}\x1f{tool}\x1f{canonical_args(args)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _count(self, tool: str, outcome: str) -> None:
+        stats = self.per_tool.setdefault(tool, {"hits": 0, "misses": 0})
+        stats[outcome] += 1
+
+    async def get(self, tool: str, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] >= time.time():
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self._count(tool, "hits")
+                return entry[1]
+            del self._memory[key]
+        if self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key)
+            if entry is not None:
+                self._remember(key, entry)
+                self.hits += 1
+                self.disk_hits += 1
+                self._count(tool, "hits")
+                return entry[1]
+        self.misses += 1
+        self._count(tool, "misses")
+        return None
+
+    async def put(self, key: str, ttl: float, value: str) -> None:
+        expires_at = time.time() + ttl
+        self._remember(key, (expires_at, value))
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.put, key, expires_at, value)
+            except Exception as e:
+                logger.warning(f"Failed to persist tool result: {e}")
+
+    def _remember(self, key: str, entry: Tuple[float, str]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._memory),
+            "max_size": self.max_size,
+            "disk": self._disk is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "per_tool": {
+                tool: {**counts, "hit_ratio": round(counts["hits"] / max(1, counts["hits"] + counts["misses"]), 4)}
+                for tool, counts in self.per_tool.items()
+            },
+        }
+
+
+class ToolCacheMiddleware(AgentMiddleware):
+    """Serves allow-listed tool calls from ToolResultCache and stores successful results"""
+
+    def __init__(self, cache: ToolResultCache, server_for_tool: Callable[[str], str]):
+        super().__init__()
+        self.cache = cache
+        self.server_for_tool = server_for_tool
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[Any]],
+    ) -> Any:
+        call = request.tool_call
+        tool = call.get("name", "")
+        server = self.server_for_tool(tool)
+        ttl = self.cache.ttl_for(server, tool)
+        if not ttl:
+            return await handler(request)
+
+        key = self.cache.make_key(server, tool, call.get("args", {}))
+        cached = await self.cache.get(tool, key)
+        if cached is not None:
+            message = messages_from_dict([json.loads(cached)])[0]
+            # Re-address the stored result to this call
+            return message.model_copy(update={"tool_call_id": call.get("id"), "id": None})
+
+        result = await handler(request)
+        if isinstance(result, ToolMessage) and getattr(result, "status", "success") != "error":
+            await self.cache.put(key, ttl, json.dumps(message_to_dict(result), default=str))
+        return result
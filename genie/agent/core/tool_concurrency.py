@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import weakref
+from typing import Any, Awaitable, Callable
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain_core.messages import AIMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ToolConcurrencyMiddleware(AgentMiddleware):
+    """
+    Caps how many tool calls from one model step run at the same time.
+    create_agent already dispatches every tool call of an AIMessage as its own task, so
+    independent calls (e.g. several search_knowledge_base queries) overlap; this bounds
+    that fan-out with a semaphore per step so one turn cannot flood an MCP server.
+    """
+
+    def __init__(self, max_concurrency: int):
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        # One semaphore per issuing AIMessage; dropped once that step's calls have finished
+        self._semaphores: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def _step_key(request: ToolCallRequest) -> str:
+        state = request.state
+        messages = state.get("messages", []) if isinstance(state, dict) else getattr(state, "messages", [])
+        call_id = request.tool_call.get("id")
+        for msg in reversed(messages or []):
+            if isinstance(msg, AIMessage) and any(c.get("id") == call_id for c in msg.tool_calls):
+                return msg.id or str(id(msg))
+        return str(call_id)
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[Any]],
+    ) -> Any:
+        if self.max_concurrency <= 0:
+            return await handler(request)
+        key = self._step_key(request)
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[key] = semaphore
+        async with semaphore:
+            logger.debug(f"Running tool call {request.tool_call.get('name')} (step {key})")
+            return await handler(request)
@@ -0,0 +1,183 @@
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+@dataclass
+class TraceStep:
+    """One LLM or tool call inside an agent run"""
+    kind: str  # "llm" or "tool"
+    name: str
+    started_at: float
+    ended_at: Optional[float] = None
+    status: str = "running"
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cache_read_tokens: Optional[int] = None
+    cache_write_tokens: Optional[int] = None
+    arg_size: Optional[int] = None
+    output_size: Optional[int] = None
+    error: Optional[str] = None
+
+    def finish(self, status: str = "ok", error: Optional[str] = None) -> None:
+        self.ended_at = time.time()
+        self.status = status
+        self.error = error
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.ended_at is None:
+            return None
+        return round((self.ended_at - self.started_at) * 1000, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {k: v for k, v in self.__dict__.items() if v is not None}
+        data["duration_ms"] = self.duration_ms
+        return data
+
+
+@dataclass
+class ExecutionTrace:
+    """All steps of one /genie/ask request"""
+    request_id: str
+    session_id: str
+    question: str
+    client_request_id: Optional[str] = None  # X-Request-Id sent by the client, for correlation only
+    started_at: float = field(default_factory=time.time)
+    ended_at: Optional[float] = None
+    status: str = "running"
+    error: Optional[str] = None
+    steps: List[TraceStep] = field(default_factory=list)
+
+    def finish(self, status: str = "ok", error: Optional[str] = None) -> None:
+        self.ended_at = time.time()
+        self.status = status
+        self.error = error
+
+    def to_dict(self) -> Dict[str, Any]:
+        llm_steps = [s for s in self.steps if s.kind == "llm"]
+        tool_steps = [s for s in self.steps if s.kind == "tool"]
+        return {
+            "request_id": self.request_id,
+            "client_request_id": self.client_request_id,
+            "session_id": self.session_id,
+            "question": self.question[:200],
+            "status": self.status,
+            "error": self.error,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "duration_ms": round((self.ended_at - self.started_at) * 1000, 2) if self.ended_at else None,
+            "summary": {
+                "llm_calls": len(llm_steps),
+                "tool_calls": len(tool_steps),
+                "llm_ms": round(sum(s.duration_ms or 0 for s in llm_steps), 2),
+                "tool_ms": round(sum(s.duration_ms or 0 for s in tool_steps), 2),
+                "input_tokens": sum(s.input_tokens or 0 for s in llm_steps),
+                "output_tokens": sum(s.output_tokens or 0 for s in llm_steps),
+                "cache_read_tokens": sum(s.cache_read_tokens or 0 for s in llm_steps),
+                "cache_write_tokens": sum(s.cache_write_tokens or 0 for s in llm_steps),
+            },
+            "steps": [s.to_dict() for s in self.steps],
+        }
+
+
+class TraceCallbackHandler(AsyncCallbackHandler):
+    """Records every chat model and tool call of an agent run into an ExecutionTrace"""
+
+    def __init__(self, trace: ExecutionTrace):
+        self.trace = trace
+        self._open: Dict[UUID, TraceStep] = {}
+
+    def _start(self, run_id: UUID, kind: str, name: str, **fields: Any) -> None:
+        step = TraceStep(kind=kind, name=name, started_at=time.time(), **fields)
+        self._open[run_id] = step
+        self.trace.steps.append(step)
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *,
+                                  run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        name = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "chat_model"
+        self._start(run_id, "llm", name)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        step = self._open.pop(run_id, None)
+        if step is None:
+            return
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if usage:
+            step.input_tokens = usage.get("input_tokens")
+            step.output_tokens = usage.get("output_tokens")
+            # Prompt caching (Anthropic/Bedrock): tokens served from / written to the provider cache
+            details = usage.get("input_token_details") or {}
+            step.cache_read_tokens = details.get("cache_read")
+            step.cache_write_tokens = details.get("cache_creation")
+        elif response.llm_output:
+            token_usage = response.llm_output.get("token_usage") or response.llm_output.get("usage") or {}
+            step.input_tokens = token_usage.get("prompt_tokens", token_usage.get("input_tokens"))
+            step.output_tokens = token_usage.get("completion_tokens", token_usage.get("output_tokens"))
+        step.finish()
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        step = self._open.pop(run_id, None)
+        if step is not None:
+            step.finish("error", str(error))
+
+    async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                            **kwargs: Any) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, "tool", name, arg_size=len(input_str or ""))
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        step = self._open.pop(run_id, None)
+        if step is not None:
+            step.output_size = len(str(getattr(output, "content", output)))
+            step.finish()
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        step = self._open.pop(run_id, None)
+        if step is not None:
+            step.finish("error", str(error))
+
+
+class TraceStore:
+    """
+    Bounded ring buffer of recent execution traces, addressable by the server-generated
+    request id and readable only from the session that made the request.
+    """
+
+    def __init__(self, max_size: int = 200):
+        self.max_size = max_size
+        self._traces: "OrderedDict[str, ExecutionTrace]" = OrderedDict()
+
+    def start(self, request_id: str, session_id: str, question: str,
+              client_request_id: Optional[str] = None) -> ExecutionTrace:
+        if request_id in self._traces:
+            raise ValueError(f"Duplicate trace id {request_id}")
+        trace = ExecutionTrace(request_id=request_id, session_id=session_id, question=question,
+                               client_request_id=client_request_id)
+        if self.max_size > 0:
+            self._traces[request_id] = trace
+            self._traces.move_to_end(request_id)
+            while len(self._traces) > self.max_size:
+                self._traces.popitem(last=False)
+        return trace
+
+    def get(self, request_id: str, session_id: str) -> Optional[ExecutionTrace]:
+        trace = self._traces.get(request_id)
+        # Another session's trace is reported as missing rather than forbidden
+        return trace if trace is not None and trace.session_id == session_id else None
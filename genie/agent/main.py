@@ -1,3 +1,4 @@
+import os
 import uvicorn
 import logging
 from contextlib import asynccontextmanager
@@ -10,7 +11,8 @@ from ..config_loader import get_mcp
 try:
     from ..log_setup import setup_logging
     if not logging.getLogger().handlers:
-    	setup_logging()
+    	# Launcher worker processes (--workers) pass the launcher's log settings through the environment
+    	setup_logging(log_level=os.getenv("GENIE_LOG_LEVEL", logging.DEBUG), log_dir=os.getenv("GENIE_LOG_PATH", "logs"))
 except ImportError:
     # Running directly 
     import logging
@@ -37,6 +39,7 @@ async def lifespan(app):
     yield
     # Shutdown
     logging.info("🚀 GenIE Agent is shutting down")
+    await agent_service.shutdown()
 
 # Global service instance
 # mcp_config = {
@@ -1,9 +1,11 @@
 from datetime import datetime
 import logging
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
 from ..core.qcli_client import QCLIClient
 from ..core.json_processor import JSONProcessor
+from ...metrics import REGISTRY, CONTENT_TYPE, instrument_app
 from functools import wraps
 import time 
 
@@ -102,6 +104,7 @@ class CloseResponse(BaseModel):
 def create_routes(qcli_client: QCLIClient) -> FastAPI:
     '''Create routes for the Kiro CLI service'''	
     app = FastAPI(title="Kiro CLI Agent API")
+    instrument_app(app, "kiro_cli")
     
     @app.get("/qcli")
     @calculate_processing_time
@@ -156,6 +159,10 @@ def create_routes(qcli_client: QCLIClient) -> FastAPI:
             # return CloseResponse(status_code=500, message=str(e), timestamp=datetime.now().isoformat())
             raise HTTPException(status_code=500, detail=str(e))
 
+    @app.get("/metrics")
+    async def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
     @app.get("/qcli/health")
     @calculate_processing_time
     async def health()->HealthResponse:
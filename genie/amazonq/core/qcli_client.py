@@ -13,6 +13,7 @@ from ...config_loader import get_chat_history_path, get_qcli_default_model
 from ..utils.convert import windows_to_wsl_path
 from ...config_loader import get_identity_provider, get_region
 from .json_processor import JSONProcessor
+from ...metrics import KIRO_READ_SECONDS, KIRO_READ_CHARS, KIRO_PARSE_SECONDS
 logger = logging.getLogger(__name__)
 
 class QCLIClient:
@@ -70,6 +71,8 @@ class QCLIClient:
         logger.info(f"Query sent: {message}")
         buffer = ""
         start_time = time.time()
+        # start_time is reset on every chunk (inactivity timeout); keep the send time for the read metric
+        sent_at = start_time
         last_data_time = time.time()
         silence_threshold = 5.0
         overall_timeout = timeout
@@ -127,6 +130,9 @@ class QCLIClient:
         if buffer == '':
             buffer = ("No data received and timed-out")
 
+        kind = "command" if message.startswith('/') else "prompt"
+        KIRO_READ_SECONDS.observe(time.time() - sent_at, kind=kind)
+        KIRO_READ_CHARS.inc(len(buffer), kind=kind)
         return buffer
 
     async def __launch_qcli_with_model(self, model_name: str):
@@ -357,7 +363,8 @@ class QCLIClient:
         response = await self.ask_question('/model', timeout=10)
         logger.info(f"model change response: {response}")
         time.sleep(1)
-        clean_response = self.json_processor.process_and_extract_json('/model', response)
+        with KIRO_PARSE_SECONDS.time(kind="command"):
+            clean_response = self.json_processor.process_and_extract_json('/model', response)
         models = []
        
         models = re.findall(r'claude-[^\s]+', clean_response)
@@ -552,6 +559,7 @@ class QCLIClient:
 
     def process_response_json(self, request: str, response: str) -> str:
         """Process the response from the Kiro CLI"""
-        clean_response = self.json_processor.process_and_extract_json(request, response)
+        with KIRO_PARSE_SECONDS.time(kind="command" if request.startswith('/') else "prompt"):
+            clean_response = self.json_processor.process_and_extract_json(request, response)
         logger.info(f"Result: {clean_response}")
         return clean_response
\ No newline at end of file
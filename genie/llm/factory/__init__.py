@@ -1,7 +1,7 @@
 from .build_llm import build_chat_llm
-from .retrieve_llm import create_llm_from_registry
+from .retrieve_llm import create_llm_from_registry, select_registry_profile
 
-__all__ = ["build_chat_llm", "create_llm_from_registry"]
+__all__ = ["build_chat_llm", "create_llm_from_registry", "select_registry_profile"]
 
 
 
@@ -8,13 +8,12 @@ from .build_llm import build_chat_llm
 logger = logging.getLogger('genie.llm.factory.retrieve_llm')
 
 
-def create_llm_from_registry(profile_name: Optional[str] = None, model: Optional[str] = None):
-	'''1. Retrieves the LLM configs stored in registry
-	   2. identifies the required config
-	   3. calls build_chat_llm to build LLM object and returns
+def select_registry_profile(profile_name: Optional[str] = None, profiles: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+	'''1. Retrieves the LLM configs stored in registry (unless given)
+	   2. returns the config matching profile_name, or the first profile
 	'''
-	logger.info(f"Creating LLM from registry - profile: {profile_name}, model: {model}")
-	profiles: List[Dict[str, Any]] = list_registry_profiles()
+	if profiles is None:
+		profiles = list_registry_profiles()
 	logger.debug(f"Found {len(profiles)} profiles in registry")
 	if not profiles:
 		logger.error("No LLM profiles found in registry")
@@ -29,9 +28,16 @@ def create_llm_from_registry(profile_name: Optional[str] = None, model: Optional
 	if not selected:
 		logger.info("No specific profile found, using first available profile")
 		selected = profiles[0]
-
-	logger.info(f"Selected profile: {selected.get('profile_name', 'unknown')} with provider: {selected.get('provider_id', 'unknown')}")
-	return build_chat_llm(selected["provider_id"], selected, model)
+	return selected
 
 
+def create_llm_from_registry(profile_name: Optional[str] = None, model: Optional[str] = None):
+	'''1. Retrieves the LLM configs stored in registry
+	   2. identifies the required config
+	   3. calls build_chat_llm to build LLM object and returns
+	'''
+	logger.info(f"Creating LLM from registry - profile: {profile_name}, model: {model}")
+	selected = select_registry_profile(profile_name)
 
+	logger.info(f"Selected profile: {selected.get('profile_name', 'unknown')} with provider: {selected.get('provider_id', 'unknown')}")
+	return build_chat_llm(selected["provider_id"], selected, model)